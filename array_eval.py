@@ -0,0 +1,136 @@
+# array_eval.py
+
+# Array encoding of positions and batched evaluation with NumPy. A position is an int8
+# array of 12 planes of 64 squares, one plane per piece type in PIECE_ORDER, and a
+# stack of positions is scored with a few matrix products instead of one Python loop
+# per board. Scores are the same as evaluation.py's, pawn structure included: white's
+# point of view, centipawns.
+#
+# NumPy is optional: without it the batch functions fall back to evaluate_board
+# one board at a time, and encode_board raises ImportError.
+
+from evaluation import (MG_TABLE, EG_TABLE, PHASE, MAX_PHASE, DOUBLED_PAWN, ISOLATED_PAWN, BACKWARD_PAWN,
+                        PASSED_PAWN_MG, PASSED_PAWN_EG, evaluate_position, evaluate_pawns, tapered_score)
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+PIECE_ORDER = 'PNBRQKpnbrqk'
+
+if np is not None:
+    # Weights flattened to match a (positions, 12 * 64) view of the planes
+    MG_WEIGHTS = np.array([MG_TABLE[piece] for piece in PIECE_ORDER], dtype=np.int32).reshape(-1)
+    EG_WEIGHTS = np.array([EG_TABLE[piece] for piece in PIECE_ORDER], dtype=np.int32).reshape(-1)
+    PHASE_WEIGHTS = np.array([PHASE[piece] for piece in PIECE_ORDER], dtype=np.int32)
+    PIECE_CODES = np.frombuffer(PIECE_ORDER.encode('ascii'), dtype=np.uint8)
+    # Passed pawn bonuses by board row for pawns advancing towards row 0
+    PASSED_MG_ROWS = np.array(PASSED_PAWN_MG[::-1], dtype=np.int32)
+    PASSED_EG_ROWS = np.array(PASSED_PAWN_EG[::-1], dtype=np.int32)
+
+
+def require_numpy():
+    if np is None:
+        raise ImportError("NumPy is required for the array position encoding")
+
+
+def board_codes(boards):
+    # (positions, 64) uint8 array of the piece characters of the boards
+    text = ''.join(''.join(''.join(row) for row in board) for board in boards)
+    return np.frombuffer(text.encode('ascii'), dtype=np.uint8).reshape(len(boards), 64)
+
+
+def encode_board(board):
+    # int8 array of shape (12, 64) for a board of 8 rows
+    return encode_boards([board])[0]
+
+
+def encode_boards(boards):
+    # Stacks boards into an int8 array of shape (positions, 12, 64)
+    require_numpy()
+    codes = board_codes(boards)
+    return (codes[:, None, :] == PIECE_CODES[None, :, None]).astype(np.int8)
+
+
+def adjacent_files(planes):
+    # Squares on a file next to an occupied square of the same row, for (positions, 8, 8) planes
+    result = np.zeros_like(planes)
+    result[:, :, 1:] |= planes[:, :, :-1]
+    result[:, :, :-1] |= planes[:, :, 1:]
+    return result
+
+
+def any_ahead(planes):
+    # Squares with an occupied square in a lower row of the same file
+    result = np.zeros_like(planes)
+    result[:, 1:] = np.logical_or.accumulate(planes, axis=1)[:, :-1]
+    return result
+
+
+def pawn_side_planes(own, enemy):
+    # (midgame, endgame) arrays of evaluation.pawn_side_terms for (positions, 8, 8) pawn
+    # planes, oriented so that the own pawns advance towards row 0
+    files = own.sum(axis=1, dtype=np.int32)
+    doubled = np.maximum(files - 1, 0).sum(axis=1)
+    neighbours = adjacent_files(files[:, None, :] > 0)
+    isolated = own & ~neighbours
+    passed = own & ~any_ahead(enemy | adjacent_files(enemy)) & ~any_ahead(own)
+    # Not backward when an own pawn on an adjacent file is on the same row or behind
+    supported = np.logical_or.accumulate(adjacent_files(own)[:, ::-1], axis=1)[:, ::-1]
+    stop_attacked = np.zeros_like(own)
+    stop_attacked[:, 2:] = adjacent_files(enemy)[:, :-2]
+    backward = own & ~isolated & ~passed & ~supported & stop_attacked
+
+    isolated = isolated.sum(axis=(1, 2), dtype=np.int32)
+    backward = backward.sum(axis=(1, 2), dtype=np.int32)
+    passed_rows = passed.sum(axis=2, dtype=np.int32)
+    mg_scores = (DOUBLED_PAWN[0] * doubled + ISOLATED_PAWN[0] * isolated + BACKWARD_PAWN[0] * backward
+                 + passed_rows @ PASSED_MG_ROWS)
+    eg_scores = (DOUBLED_PAWN[1] * doubled + ISOLATED_PAWN[1] * isolated + BACKWARD_PAWN[1] * backward
+                 + passed_rows @ PASSED_EG_ROWS)
+    return mg_scores, eg_scores
+
+
+def evaluate_pawn_planes(stack):
+    # Pawn structure (midgame, endgame) arrays of a (positions, 12, 64) stack, as evaluate_pawns
+    white = stack[:, PIECE_ORDER.index('P')].reshape(-1, 8, 8).astype(bool)
+    black = stack[:, PIECE_ORDER.index('p')].reshape(-1, 8, 8).astype(bool)
+    white_mg, white_eg = pawn_side_planes(white, black)
+    black_mg, black_eg = pawn_side_planes(black[:, ::-1], white[:, ::-1])  # Mirrored for black
+    return white_mg - black_mg, white_eg - black_eg
+
+
+def evaluate_planes(stack):
+    # Tapered scores of a (positions, 12, 64) stack, as an int64 array
+    flat = stack.reshape(len(stack), -1).astype(np.int32)
+    pawn_mg, pawn_eg = evaluate_pawn_planes(stack)
+    mg_scores = flat @ MG_WEIGHTS + pawn_mg
+    eg_scores = flat @ EG_WEIGHTS + pawn_eg
+    phases = np.minimum(stack.sum(axis=2, dtype=np.int32) @ PHASE_WEIGHTS, MAX_PHASE)
+    scores = mg_scores.astype(np.int64) * phases + eg_scores.astype(np.int64) * (MAX_PHASE - phases)
+    return scores // MAX_PHASE
+
+
+def evaluate_board(board):
+    # Score of one board without NumPy
+    mg_score, eg_score, phase = evaluate_position(board)
+    pawn_mg, pawn_eg = evaluate_pawns(board)
+    return tapered_score(mg_score + pawn_mg, eg_score + pawn_eg, phase)
+
+
+def evaluate_boards(boards):
+    # Scores a list of boards in one vectorized call when NumPy is available
+    if np is None or not boards:
+        return [evaluate_board(board) for board in boards]
+    return evaluate_planes(encode_boards(boards)).tolist()
+
+
+def evaluate_children(engine, moves):
+    # Scores the positions after each of the moves, e.g. all children of a frontier node
+    boards = []
+    for move in moves:
+        engine.apply_move(move)
+        boards.append([row[:] for row in engine.board])
+        engine.undo_move()
+    return evaluate_boards(boards)
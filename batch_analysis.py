@@ -0,0 +1,187 @@
+# batch_analysis.py
+
+# Headless analysis of many positions. Positions are streamed from a FEN file (one
+# position per line) or a PGN file (every position of every game), searched on a pool
+# of worker processes that each keep one engine for their lifetime, and written out as
+# JSON lines. At most `window` positions are in flight at a time, so memory use does
+# not grow with the size of the input. With --static, positions are only given their
+# static evaluation, scored in batches by array_eval.py without a search.
+
+import argparse
+import itertools
+import json
+import multiprocessing
+import sys
+import time
+from collections import deque
+
+from chess_ai import MATE_SCORE
+
+# Positions scored per vectorized call by evaluate_static
+STATIC_BATCH = 1024
+
+# Per-process state, set up once by init_worker
+worker_engine = None
+worker_search_args = None
+
+
+def iter_fen_positions(lines):
+    # Yields (id, fen) for every non-empty line; text after ';' is a comment
+    for number, line in enumerate(lines, 1):
+        line = line.split(';', 1)[0].strip()
+        if line:
+            yield f"line {number}", line
+
+
+def iter_pgn_positions(lines, max_plies=None):
+    # Yields (id, fen) for the position before every move of every game, up to max_plies
+    # per game. A game stops at its first move the engine cannot play.
+    from chess_engine import ChessEngine, START_FEN
+    from pgn import iter_games, parse_san
+    engine = ChessEngine()
+    for number, (headers, san_moves, _) in enumerate(iter_games(lines), 1):
+        try:
+            engine.load_fen(headers.get('FEN', START_FEN))
+        except ValueError:
+            continue
+        for ply, san in enumerate(san_moves[:max_plies]):
+            try:
+                move = parse_san(engine, san)
+            except ValueError:
+                break
+            yield f"game {number} ply {ply}", engine.to_fen()
+            engine.apply_move(move)
+
+
+def init_worker(backend, tt_size_mb, search_args):
+    global worker_engine, worker_search_args
+    from chess_engine import ChessEngine
+    from chess_ai import ChessAI
+    from opening_book import MemoryBook
+    worker_engine = ChessEngine(backend)
+    worker_engine.ai = ChessAI(worker_engine, tt_size_mb=tt_size_mb)
+    worker_engine.ai.opening_book = MemoryBook()  # Always search; book moves carry no score
+    worker_search_args = search_args
+
+
+def analyze_position(position):
+    # Searches one (id, fen) position; the score is in centipawns for the side to move
+    position_id, fen = position
+    engine = worker_engine
+    ai = engine.ai
+    start_time = time.time()
+    try:
+        engine.load_fen(fen)
+    except ValueError as error:
+        return {'id': position_id, 'fen': fen, 'error': str(error)}
+    move = ai.choose_move(**worker_search_args)
+    score = ai.best_score if engine.current_player == 'black' else -ai.best_score
+    if move is None:
+        # No legal moves: checkmate or stalemate
+        score = -MATE_SCORE if engine.is_in_check(engine.current_player) else 0
+    return {
+        'id': position_id,
+        'fen': fen,
+        'best_move': None if move is None else engine.move_to_str(move),
+        'score': score,
+        'depth': ai.completed_depth if move is not None else 0,
+        'nodes': ai.stats.nodes,
+        'seconds': round(time.time() - start_time, 6),
+    }
+
+
+def analyze_positions(positions, workers=None, backend='mailbox', tt_size_mb=16, window=None, **search_args):
+    # Yields the analysis of every (id, fen) position in input order
+    workers = workers or multiprocessing.cpu_count()
+    window = window or workers * 4
+    pool = multiprocessing.Pool(workers, initializer=init_worker, initargs=(backend, tt_size_mb, search_args))
+    try:
+        pending = deque()
+        for position in positions:
+            pending.append(pool.apply_async(analyze_position, (position,)))
+            if len(pending) >= window:
+                yield pending.popleft().get()
+        while pending:
+            yield pending.popleft().get()
+    finally:
+        pool.terminate()
+        pool.join()
+
+
+def evaluate_static(positions, batch_size=STATIC_BATCH):
+    # Yields the static evaluation of every (id, fen) position in input order, for the side to move
+    from chess_engine import ChessEngine
+    from array_eval import evaluate_boards
+    engine = ChessEngine()
+    positions = iter(positions)
+    while True:
+        batch = list(itertools.islice(positions, batch_size))
+        if not batch:
+            return
+        results = []
+        boards = []
+        for position_id, fen in batch:
+            try:
+                engine.load_fen(fen)
+            except ValueError as error:
+                results.append({'id': position_id, 'fen': fen, 'error': str(error)})
+                continue
+            results.append({'id': position_id, 'fen': fen, 'white': engine.current_player == 'white'})
+            boards.append(engine.board)
+        scores = iter(evaluate_boards(boards))
+        for result in results:
+            if 'error' not in result:
+                score = next(scores)
+                result['score'] = score if result.pop('white') else -score
+            yield result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Analyze the positions of a FEN or PGN file")
+    parser.add_argument('input', help="FEN file (one position per line) or PGN file")
+    parser.add_argument('--format', choices=['fen', 'pgn'], help="Input format; guessed from the file extension")
+    parser.add_argument('--output', help="JSON-lines file to write; standard output by default")
+    parser.add_argument('--depth', type=int, help="Search depth per position")
+    parser.add_argument('--movetime', type=float, help="Seconds per position")
+    parser.add_argument('--nodes', type=int, help="Node budget per position")
+    parser.add_argument('--workers', type=int, help="Worker processes; all cores by default")
+    parser.add_argument('--backend', choices=['mailbox', 'bitboard'], default='mailbox')
+    parser.add_argument('--hash', type=int, default=16, help="Transposition table size per worker in MB")
+    parser.add_argument('--plies', type=int, help="Positions per PGN game to analyze")
+    parser.add_argument('--limit', type=int, help="Analyze only the first positions")
+    parser.add_argument('--static', action='store_true', help="Only evaluate the positions, without searching")
+    args = parser.parse_args(argv)
+
+    input_format = args.format or ('pgn' if args.input.lower().endswith('.pgn') else 'fen')
+    search_args = {'depth': args.depth, 'movetime': args.movetime, 'nodes': args.nodes}
+
+    start_time = time.time()
+    count = 0
+    with open(args.input, encoding='utf-8', errors='replace') as file:
+        if input_format == 'pgn':
+            positions = iter_pgn_positions(file, args.plies)
+        else:
+            positions = iter_fen_positions(file)
+        if args.limit is not None:
+            positions = itertools.islice(positions, args.limit)
+        output = open(args.output, 'w') if args.output else sys.stdout
+        try:
+            if args.static:
+                results = evaluate_static(positions)
+            else:
+                results = analyze_positions(positions, args.workers, args.backend, args.hash, **search_args)
+            for result in results:
+                output.write(json.dumps(result) + '\n')
+                count += 1
+        finally:
+            if output is not sys.stdout:
+                output.close()
+
+    elapsed = time.time() - start_time
+    rate = count / elapsed if elapsed > 0 else 0.0
+    print(f"Analyzed {count} positions in {elapsed:.2f}s ({rate:.1f} positions/s)", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
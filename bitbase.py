@@ -0,0 +1,337 @@
+# bitbase.py
+
+# Endgame tables for a lone king against king plus pieces (KPK, KRK, KQK, KBNK).
+# Tables are generated locally by retrograde analysis and stored on disk with one byte
+# per position: 0 for a draw, otherwise 1 + the number of plies to mate. The side to
+# move wins when that number is odd and is getting mated when it is even.
+#
+# Tables are built with the stronger side as white; positions with a black stronger
+# side are probed by mirroring the board vertically and swapping the colors.
+# Generation is done once, offline: python bitbase.py generate KQK KRK KPK
+
+import argparse
+import os
+import sys
+import time
+
+from bitboard import KNIGHT_ATTACKS, KING_ATTACKS, PAWN_ATTACKS, rook_attacks, bishop_attacks, iter_squares
+
+# Results for the side to move
+DRAW = 0
+WIN = 1
+LOSS = 2
+ILLEGAL = 3
+
+# Pieces of the stronger side besides its king, in index order
+ENDGAMES = {
+    'KQK': 'Q',
+    'KRK': 'R',
+    'KPK': 'P',
+    'KBNK': 'BN',
+}
+# Tables a table's generation probes, e.g. promotions from KPK lead into KQK
+DEPENDENCIES = {
+    'KPK': ['KQK'],
+}
+
+DEFAULT_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bitbases')
+
+# Remaining-move counter of black-to-move positions whose result is already final
+FINAL = 255
+# Longest distance to mate a table byte can hold
+MAX_PLIES = 254
+
+
+def piece_attacks(kind, square, occupied):
+    if kind == 'P':
+        return PAWN_ATTACKS['white'][square]
+    if kind == 'N':
+        return KNIGHT_ATTACKS[square]
+    if kind == 'B':
+        return bishop_attacks(square, occupied)
+    if kind == 'R':
+        return rook_attacks(square, occupied)
+    if kind == 'Q':
+        return bishop_attacks(square, occupied) | rook_attacks(square, occupied)
+    return KING_ATTACKS[square]
+
+
+def encode_index(black_to_move, squares):
+    # squares are (white king, black king, white pieces...) as 0-63 square indexes
+    index = black_to_move
+    for square in squares:
+        index = index << 6 | square
+    return index
+
+
+def decode_index(index, count):
+    squares = [0] * count
+    for position in range(count - 1, -1, -1):
+        squares[position] = index & 63
+        index >>= 6
+    return index, squares
+
+
+class BitbaseGenerator:
+    def __init__(self, name, directory=DEFAULT_DIRECTORY):
+        self.name = name
+        self.kinds = ENDGAMES[name]
+        self.count = 2 + len(self.kinds)
+        self.size = 2 << (6 * self.count)
+        self.directory = directory
+        self.values = bytearray(self.size)
+        self.remaining = bytearray(self.size)  # Non-losing moves left for black-to-move positions
+        self.plies = bytearray(self.size)  # Plies to mate of decided positions
+        self.layers = {}  # Plies to mate -> decided positions still to walk back from
+
+    def white_attacks(self, white_king, pieces, occupied, skip=None):
+        attacks = KING_ATTACKS[white_king]
+        for position, square in enumerate(pieces):
+            if position != skip:
+                attacks |= piece_attacks(self.kinds[position], square, occupied)
+        return attacks
+
+    def decide(self, index, value, plies):
+        if plies > MAX_PLIES:
+            raise ValueError(f"{self.name}: mate in {plies} plies does not fit the table")
+        self.values[index] = value
+        self.plies[index] = plies
+        self.layers.setdefault(plies, []).append(index)
+
+    def generate(self):
+        queen_table = load_table('KQK', self.directory) if 'P' in self.kinds else None
+        self.initialize(queen_table)
+        self.propagate()
+        return self.pack()
+
+    def initialize(self, queen_table):
+        # Marks illegal positions, mates and stalemates, positions where black can capture
+        # (always drawn) and promotions into won KQK positions; counts black's moves
+        values = self.values
+        remaining = self.remaining
+        count = self.count
+        for index in range(self.size):
+            black_to_move, squares = decode_index(index, count)
+            white_king, black_king = squares[0], squares[1]
+            pieces = squares[2:]
+
+            occupied = 0
+            for square in squares:
+                occupied |= 1 << square
+            if bin(occupied).count('1') != count or KING_ATTACKS[white_king] >> black_king & 1:
+                values[index] = ILLEGAL
+                continue
+            if any(kind == 'P' and not 8 <= square < 56 for kind, square in zip(self.kinds, pieces)):
+                values[index] = ILLEGAL
+                continue
+
+            if not black_to_move:
+                if self.white_attacks(white_king, pieces, occupied) >> black_king & 1:
+                    values[index] = ILLEGAL  # The side not to move is in check
+                    continue
+                for position, kind in enumerate(self.kinds):
+                    square = pieces[position]
+                    if kind == 'P' and square < 16 and not occupied >> (square - 8) & 1:
+                        # Promotion to a queen, leading to KQK with black to move
+                        promoted = encode_index(1, [white_king, black_king, square - 8])
+                        result, plies = probe_entry(queen_table, promoted)
+                        if result == LOSS:
+                            self.decide(index, WIN, plies + 1)
+                            break
+                continue
+
+            # Black to move: only the king can move
+            without_king = occupied & ~(1 << black_king)
+            attacked = self.white_attacks(white_king, pieces, without_king)
+            moves = 0
+            can_capture = False
+            for target in iter_squares(KING_ATTACKS[black_king] & ~KING_ATTACKS[white_king]):
+                if occupied >> target & 1:
+                    captured = pieces.index(target)
+                    if not self.white_attacks(white_king, pieces, without_king, captured) >> target & 1:
+                        can_capture = True
+                elif not attacked >> target & 1:
+                    moves += 1
+            if can_capture:
+                remaining[index] = FINAL  # Capturing leaves too little material to win
+            elif moves:
+                remaining[index] = moves
+            elif attacked >> black_king & 1:
+                self.decide(index, LOSS, 0)  # Checkmate
+                remaining[index] = FINAL
+            else:
+                remaining[index] = FINAL  # Stalemate
+
+    def propagate(self):
+        # Walks back from decided positions: a position before a loss is a win for white,
+        # and a black position whose every move leads to a white win is a loss. Positions
+        # are walked in order of plies to mate, so a win is reached first by its fastest
+        # mate and a loss is decided by its slowest one.
+        values = self.values
+        remaining = self.remaining
+        count = self.count
+        layers = self.layers
+        plies = 0
+        while layers:
+            for index in layers.pop(plies, []):
+                black_to_move, squares = decode_index(index, count)
+                black_king = squares[1]
+                occupied = 0
+                for square in squares:
+                    occupied |= 1 << square
+
+                if black_to_move:
+                    for previous in self.white_predecessors(squares, occupied):
+                        if values[previous] == DRAW:
+                            self.decide(previous, WIN, plies + 1)
+                else:
+                    for origin in iter_squares(KING_ATTACKS[black_king] & ~occupied):
+                        squares[1] = origin
+                        previous = encode_index(1, squares)
+                        if values[previous] == DRAW and remaining[previous] != FINAL:
+                            remaining[previous] -= 1
+                            if remaining[previous] == 0:
+                                self.decide(previous, LOSS, plies + 1)
+                                remaining[previous] = FINAL
+                    squares[1] = black_king
+            plies += 1
+
+    def white_predecessors(self, squares, occupied):
+        # Indexes of white-to-move positions one white move before the position
+        white_king = squares[0]
+        for origin in iter_squares(KING_ATTACKS[white_king] & ~occupied):
+            squares[0] = origin
+            yield encode_index(0, squares)
+        squares[0] = white_king
+
+        for position, kind in enumerate(self.kinds):
+            square = squares[2 + position]
+            if kind == 'P':
+                origins = 0
+                if square + 8 < 56 and not occupied >> (square + 8) & 1:
+                    origins |= 1 << (square + 8)
+                    if square // 8 == 4 and not occupied >> (square + 16) & 1:
+                        origins |= 1 << (square + 16)  # Double step from the starting row
+            else:
+                origins = piece_attacks(kind, square, occupied) & ~occupied
+            for origin in iter_squares(origins):
+                squares[2 + position] = origin
+                yield encode_index(0, squares)
+            squares[2 + position] = square
+
+    def pack(self):
+        values = self.values
+        plies = self.plies
+        packed = bytearray(self.size)
+        for index in range(self.size):
+            if values[index] == WIN or values[index] == LOSS:
+                packed[index] = plies[index] + 1
+        return bytes(packed)
+
+
+def table_path(name, directory=DEFAULT_DIRECTORY):
+    return os.path.join(directory, name + '.dtm')
+
+
+def load_table(name, directory=DEFAULT_DIRECTORY):
+    path = table_path(name, directory)
+    if not os.path.exists(path):
+        return None
+    with open(path, 'rb') as file:
+        return file.read()
+
+
+def probe_entry(table, index):
+    # (result for the side to move, plies to mate), with None plies for a draw
+    if table is None:
+        return None, None
+    value = table[index]
+    if value == 0:
+        return DRAW, None
+    plies = value - 1
+    return (WIN if plies % 2 else LOSS), plies
+
+
+def generate_table(name, directory=DEFAULT_DIRECTORY):
+    for dependency in DEPENDENCIES.get(name, []):
+        if not os.path.exists(table_path(dependency, directory)):
+            generate_table(dependency, directory)
+    os.makedirs(directory, exist_ok=True)
+    data = BitbaseGenerator(name, directory).generate()
+    with open(table_path(name, directory), 'wb') as file:
+        file.write(data)
+    return data
+
+
+class EndgameTablebase:
+    # Probe API used by the search. Tables are read from disk the first time a
+    # position with their material signature is probed; missing tables are not generated.
+    def __init__(self, directory=DEFAULT_DIRECTORY):
+        self.directory = directory
+        self.tables = {}  # Name -> table bytes, or None when there is no file
+
+    def signature(self, piece_counts):
+        # Returns (table name, strong side) for a probeable material balance, else None
+        white = ''.join(kind * piece_counts[kind] for kind in 'QRBNP')
+        black = ''.join(kind * piece_counts[kind.lower()] for kind in 'QRBNP')
+        if white and not black:
+            pieces, strong = white, 'white'
+        elif black and not white:
+            pieces, strong = black, 'black'
+        else:
+            return None
+        name = 'K' + pieces + 'K'
+        if name not in ENDGAMES:
+            return None
+        return name, strong
+
+    def probe(self, engine):
+        # (result for the side to move, plies to mate) as from probe_entry, or None if no
+        # table covers the position
+        found = self.signature(engine.piece_counts)
+        if found is None:
+            return None
+        name, strong = found
+        if name not in self.tables:
+            self.tables[name] = load_table(name, self.directory)
+        table = self.tables[name]
+        if table is None:
+            return None
+
+        # Square indexes with the stronger side as white
+        kinds = ENDGAMES[name]
+        pieces = [None] * len(kinds)
+        board = engine.board
+        for row in range(8):
+            for col in range(8):
+                piece = board[row][col]
+                if piece != ' ' and piece.upper() != 'K':
+                    pieces[kinds.index(piece.upper())] = row * 8 + col
+        strong_king = engine.king_positions[strong]
+        weak_king = engine.king_positions['black' if strong == 'white' else 'white']
+        squares = [strong_king[0] * 8 + strong_king[1], weak_king[0] * 8 + weak_king[1]] + pieces
+        if strong == 'black':
+            squares = [(7 - square // 8) * 8 + square % 8 for square in squares]
+        weak_to_move = engine.current_player != strong
+        return probe_entry(table, encode_index(int(weak_to_move), squares))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate endgame tables")
+    parser.add_argument('command', choices=['generate'])
+    parser.add_argument('tables', nargs='*', default=['KQK', 'KRK', 'KPK'],
+                        help="Tables to generate (KBNK takes much longer than the others)")
+    parser.add_argument('--directory', default=DEFAULT_DIRECTORY)
+    args = parser.parse_args(argv)
+
+    for name in args.tables:
+        if name not in ENDGAMES:
+            parser.error(f"Unknown table {name}; choose from {', '.join(ENDGAMES)}")
+        start_time = time.time()
+        generate_table(name, args.directory)
+        print(f"{name}: written to {table_path(name, args.directory)} in {time.time() - start_time:.1f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,176 @@
+# bitboard.py
+
+# Bitboard position backend. Squares are numbered row * 8 + col, with row 0 being
+# black's back rank, so square indexes line up with ChessEngine.board[row][col].
+
+PIECES = 'PNBRQKpnbrqk'
+
+KNIGHT_OFFSETS = [(-2, -1), (-2, 1), (-1, -2), (-1, 2), (1, -2), (1, 2), (2, -1), (2, 1)]
+KING_OFFSETS = [(-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1)]
+ROOK_DIRECTIONS = [(-1, 0), (1, 0), (0, -1), (0, 1)]
+BISHOP_DIRECTIONS = [(-1, -1), (-1, 1), (1, -1), (1, 1)]
+
+
+def leaper_table(offsets):
+    table = []
+    for square in range(64):
+        row, col = divmod(square, 8)
+        mask = 0
+        for d_row, d_col in offsets:
+            r = row + d_row
+            c = col + d_col
+            if 0 <= r < 8 and 0 <= c < 8:
+                mask |= 1 << (r * 8 + c)
+        table.append(mask)
+    return table
+
+
+def ray_table(d_row, d_col):
+    table = []
+    for square in range(64):
+        row, col = divmod(square, 8)
+        mask = 0
+        r = row + d_row
+        c = col + d_col
+        while 0 <= r < 8 and 0 <= c < 8:
+            mask |= 1 << (r * 8 + c)
+            r += d_row
+            c += d_col
+        table.append(mask)
+    return table
+
+
+# Precomputed attack tables
+KNIGHT_ATTACKS = leaper_table(KNIGHT_OFFSETS)
+KING_ATTACKS = leaper_table(KING_OFFSETS)
+# Squares attacked by a pawn of the given color standing on each square
+PAWN_ATTACKS = {
+    'white': leaper_table([(-1, -1), (-1, 1)]),
+    'black': leaper_table([(1, -1), (1, 1)]),
+}
+# Rays per direction, paired with whether the direction walks towards higher square indexes
+ROOK_RAYS = [(ray_table(d_row, d_col), d_row * 8 + d_col > 0) for d_row, d_col in ROOK_DIRECTIONS]
+BISHOP_RAYS = [(ray_table(d_row, d_col), d_row * 8 + d_col > 0) for d_row, d_col in BISHOP_DIRECTIONS]
+
+
+def slider_attacks(square, occupied, rays):
+    attacks = 0
+    for table, positive in rays:
+        ray = table[square]
+        blockers = ray & occupied
+        if blockers:
+            # The nearest blocker is the lowest bit on increasing rays and the highest on decreasing ones
+            if positive:
+                blocker = (blockers & -blockers).bit_length() - 1
+            else:
+                blocker = blockers.bit_length() - 1
+            ray ^= table[blocker]
+        attacks |= ray
+    return attacks
+
+
+def rook_attacks(square, occupied):
+    return slider_attacks(square, occupied, ROOK_RAYS)
+
+
+def bishop_attacks(square, occupied):
+    return slider_attacks(square, occupied, BISHOP_RAYS)
+
+
+def iter_squares(mask):
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+class Bitboards:
+    def __init__(self, board=None):
+        self.pieces = dict.fromkeys(PIECES, 0)  # One bitboard per piece type and color
+        self.occupancy = {'white': 0, 'black': 0}
+        self.occupied = 0
+        if board is not None:
+            self.load(board)
+
+    def load(self, board):
+        for piece in PIECES:
+            self.pieces[piece] = 0
+        self.occupancy['white'] = 0
+        self.occupancy['black'] = 0
+        self.occupied = 0
+        for row in range(8):
+            for col in range(8):
+                if board[row][col] != ' ':
+                    self.put(board[row][col], row * 8 + col)
+
+    def put(self, piece, square):
+        bit = 1 << square
+        self.pieces[piece] |= bit
+        self.occupancy['white' if piece.isupper() else 'black'] |= bit
+        self.occupied |= bit
+
+    def remove(self, piece, square):
+        mask = ~(1 << square)
+        self.pieces[piece] &= mask
+        self.occupancy['white' if piece.isupper() else 'black'] &= mask
+        self.occupied &= mask
+
+    def find(self, piece):
+        mask = self.pieces[piece]
+        if not mask:
+            return None
+        return (mask & -mask).bit_length() - 1
+
+    def is_attacked(self, square, by_player):
+        # Works backward from the target square: a piece attacks it if the same
+        # kind of piece standing on the target would attack the piece
+        pieces = self.pieces
+        if by_player == 'white':
+            pawn, knight, bishop, rook, queen, king = 'P', 'N', 'B', 'R', 'Q', 'K'
+            defender = 'black'
+        else:
+            pawn, knight, bishop, rook, queen, king = 'p', 'n', 'b', 'r', 'q', 'k'
+            defender = 'white'
+
+        if PAWN_ATTACKS[defender][square] & pieces[pawn]:
+            return True
+        if KNIGHT_ATTACKS[square] & pieces[knight]:
+            return True
+        if KING_ATTACKS[square] & pieces[king]:
+            return True
+        diagonal = pieces[bishop] | pieces[queen]
+        if diagonal and bishop_attacks(square, self.occupied) & diagonal:
+            return True
+        straight = pieces[rook] | pieces[queen]
+        if straight and rook_attacks(square, self.occupied) & straight:
+            return True
+        return False
+
+    def targets(self, piece, square):
+        # Pseudo-legal destinations of piece on square, excluding squares holding own pieces
+        player = 'white' if piece.isupper() else 'black'
+        own = self.occupancy[player]
+        kind = piece.upper()
+
+        if kind == 'P':
+            enemy = self.occupancy['black' if player == 'white' else 'white']
+            moves = PAWN_ATTACKS[player][square] & enemy
+            row = square >> 3
+            step = -8 if player == 'white' else 8
+            push = square + step
+            if 0 <= push < 64 and not self.occupied >> push & 1:
+                moves |= 1 << push
+                start_row = 6 if player == 'white' else 1
+                double = push + step
+                if row == start_row and not self.occupied >> double & 1:
+                    moves |= 1 << double
+            return moves
+        if kind == 'N':
+            return KNIGHT_ATTACKS[square] & ~own
+        if kind == 'K':
+            return KING_ATTACKS[square] & ~own
+        if kind == 'B':
+            return bishop_attacks(square, self.occupied) & ~own
+        if kind == 'R':
+            return rook_attacks(square, self.occupied) & ~own
+        return (bishop_attacks(square, self.occupied) | rook_attacks(square, self.occupied)) & ~own
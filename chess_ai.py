@@ -1,105 +1,496 @@
 # chess_ai.py
 
-import random
+import os
+import time
+from transposition import TranspositionTable, EXACT, LOWER_BOUND, UPPER_BOUND
+from move_ordering import MoveOrderer
+from evaluation import tapered_score, evaluate_pawns
+from pawn_hash import PawnHashTable
+from search_stats import SearchStats
+from opening_book import OpeningBook, BUILTIN_LINES, book_from_lines, choose_book_move
+from bitbase import EndgameTablebase, DEFAULT_DIRECTORY, MAX_PLIES, WIN
+
+# Score of a checkmate; larger than any material balance
+MATE_SCORE = 10000
+# Base score of a position an endgame bitbase reports as won; below mate scores so
+# a mate found by the search is still preferred
+TABLEBASE_WIN_SCORE = MATE_SCORE // 2
+# Total piece count (kings included) at or below which the bitbases are probed
+TABLEBASE_PIECES = 4
+
+# Deepest iteration of a timed search
+MAX_SEARCH_DEPTH = 64
+# Nodes searched between two checks of the time and node budgets
+CHECK_INTERVAL = 256
+# Moves the remaining clock time is shared between when no movetime is given
+MOVES_TO_GO = 30
+# Book file used when none is given; the built-in lines are used if it does not exist
+DEFAULT_BOOK = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'book.bin')
+
+# Search techniques that can be switched off, e.g. to compare them in matches
+SEARCH_FEATURES = {
+    'pvs': True,  # Principal variation search: zero-window searches after the first move
+    'null_move': True,  # Null-move pruning
+    'lmr': True,  # Late move reductions of quiet moves
+    'aspiration': True,  # Root search window around the score of the previous iteration
+}
+# Depth reduction of the null-move search
+NULL_MOVE_REDUCTION = 2
+# Game phase (see evaluation.py) at or below which a null-move cutoff is verified, since
+# zugzwang is common with little material left
+NULL_MOVE_VERIFY_PHASE = 6
+# Quiet moves from this index in the move list on are searched with reduced depth
+LMR_MIN_MOVES = 3
+# Index from which late moves are reduced by two plies instead of one
+LMR_DEEP_MOVES = 8
+LMR_MIN_DEPTH = 3
+# Half-width of the first aspiration window, and the width at which it is given up
+ASPIRATION_WINDOW = 50
+ASPIRATION_LIMIT = 1000
+INFINITY = float('inf')
+# Size of the pawn structure cache in MB
+PAWN_HASH_MB = 2
 
 class ChessAI:
-    def __init__(self, engine, max_depth=2):
+    def __init__(self, engine, max_depth=2, tt_size_mb=16, movetime=None, stats_log=None, workers=None,
+                 book_path=None, tablebase_dir=None, features=None):
         self.engine = engine  # Instance of ChessEngine
-        self.max_depth = max_depth
-        self.opening_book = self.load_opening_book()
+        self.max_depth = max_depth  # Depth searched when no time budget is given
+        self.movetime = movetime  # Default time budget per move in seconds, None for a fixed depth
+        self.transposition_table = TranspositionTable(tt_size_mb)  # Kept across moves of a game
+        self.move_orderer = MoveOrderer()
+        self.pawn_table = PawnHashTable(PAWN_HASH_MB)  # Pawn structure scores by pawn hash
+        self.book_path = book_path
+        self.opening_book = None  # Opened on first use
+        self.tablebase_dir = tablebase_dir
+        self.tablebase = EndgameTablebase(tablebase_dir or DEFAULT_DIRECTORY)  # Tables load on first probe
+        self.stats = SearchStats()  # Telemetry of the running or last search
+        self.stats_log = stats_log  # File the stats of every search are appended to as JSON lines
+        self.tt_size_mb = tt_size_mb
+        self.workers = workers  # Worker processes for root-parallel search; None or 1 searches in-process
+        self.parallel = None  # ParallelSearch pool, created on the first parallel search or copy
+        self.is_copy = False  # Made by copy_for: the pool belongs to the AI it was copied from
+        self.shared_stop = None  # Stop flag shared with the parent process when running as a worker
+        self.on_iteration = None  # Called with the AI after every completed iteration, e.g. for UCI info lines
+        self.features = dict(SEARCH_FEATURES)  # Search techniques in use, see SEARCH_FEATURES
+        self.features.update(features or {})
+
+        # Budget of the running search
+        self.searching = False  # True from begin_search until choose_move returns
+        self.search_start = 0.0
+        self.depth_limit = max_depth
+        self.stop_search = False
+        self.deadline = None
+        self.node_limit = None
+        self.completed_depth = 0
+        self.best_score = 0
+        self.root_ply = 0  # history_size of the engine at the root of the search
+        self.root_in_tablebase = False  # The root position is covered by an endgame bitbase
+
+    def copy_for(self, engine):
+        # AI for a copy of the engine with the same settings, sharing the transposition table
+        # and worker pool so work done on either is reused by the other
+        ai = ChessAI(engine, self.max_depth, tt_size_mb=0, movetime=self.movetime,
+                     stats_log=self.stats_log, workers=self.workers, book_path=self.book_path,
+                     tablebase_dir=self.tablebase_dir, features=self.features)
+        ai.tt_size_mb = self.tt_size_mb
+        ai.transposition_table = self.transposition_table
+        ai.pawn_table = self.pawn_table
+        # Searches run on copies, so the pool is started here where close() can reach it
+        self.start_parallel()
+        ai.parallel = self.parallel
+        ai.is_copy = True
+        # The book is opened once here and shared, instead of once per search copy
+        if self.opening_book is None:
+            self.opening_book = self.load_opening_book()
+        ai.opening_book = self.opening_book
+        ai.tablebase = self.tablebase
+        ai.on_iteration = self.on_iteration
+        return ai
 
     def load_opening_book(self):
-        # Placeholder for loading the opening book from PGN data
-        # Due to computational constraints, we'll simulate a small opening book
-        opening_book = {
-            "": ["e2e4", "d2d4"],
-            "e2e4": ["e7e5", "c7c5", "e7e6"],
-            "d2d4": ["d7d5", "g8f6", "e7e6"],
-            # Add more openings as needed
-        }
-        return opening_book
-
-    def choose_move(self):
-        # Get the moves made so far
-        moves_made = self.engine.get_moves_made()
-        key = ''.join(moves_made)
+        # Memory-maps the book file; only the built-in lines are used when there is none
+        path = self.book_path
+        if path is None and os.path.exists(DEFAULT_BOOK):
+            path = DEFAULT_BOOK
+        if path is not None:
+            return OpeningBook(path)
+        return book_from_lines(BUILTIN_LINES)
+
+    def choose_move(self, movetime=None, clock=None, increment=0, depth=None, nodes=None):
+        # movetime, clock and increment are in seconds; clock is the time left for the side to move
+        self.stats = SearchStats()
+        move = self.search(movetime, clock, increment, depth, nodes)
+        self.searching = False
+        self.stats.finish()
+        if move is not None:
+            self.stats.best_move = self.engine.move_to_str(move)
+        if self.stats_log:
+            self.stats.write_json_line(self.stats_log)
+        return move
 
+    def search(self, movetime=None, clock=None, increment=0, depth=None, nodes=None):
         # If in opening phase, use opening book
-        if key in self.opening_book:
-            move = self.choose_opening_move(key)
-            if move:
-                return move
+        move = self.choose_opening_move()
+        if move:
+            self.stats.book_move = True
+            return move
 
-        # Otherwise, use Minimax algorithm
-        best_move = None
-        best_value = float('-inf')
-        alpha = float('-inf')
-        beta = float('inf')
+        # Otherwise, search deeper and deeper until the budget runs out
+        budget = self.time_budget(movetime, clock, increment)
+        if depth is None:
+            depth = self.max_depth if budget is None and nodes is None else MAX_SEARCH_DEPTH
+        self.search_start = time.time()
+        self.depth_limit = depth
+        self.begin_search(None if budget is None else self.search_start + budget, nodes)
+        self.transposition_table.new_search()
+        self.move_orderer.new_search()
+        if not self.is_copy:
+            self.start_parallel()
 
         possible_moves = self.engine.generate_all_moves()
-        random.shuffle(possible_moves)  # Shuffle to introduce variability
-
-        for move in possible_moves:
-            self.engine.make_move(move)
-            move_value = self.minimax(self.max_depth - 1, False, alpha, beta)
-            self.engine.undo_move()
-            if move_value > best_value:
-                best_value = move_value
-                best_move = move
-            alpha = max(alpha, best_value)
-            if beta <= alpha:
-                break  # Alpha-beta pruning
+        if not possible_moves:
+            return None
+        possible_moves = self.move_orderer.order_moves(self.engine.board, possible_moves, 0, self.hash_move())
+
+        best_move = possible_moves[0]
+        score = None  # Score of the last completed iteration for the side to move
+        current_depth = 0
+        while current_depth < self.depth_limit:
+            current_depth += 1
+            self.stats.start_iteration()
+            if self.parallel is not None:
+                result = self.parallel.search_root(self, current_depth, possible_moves)
+            else:
+                result = self.aspiration_search(current_depth, possible_moves, score)
+            if result is None:
+                self.stats.stopped = True
+                break  # Stopped mid-iteration; keep the last completed result
+            best_move, score = result
+            # best_score keeps the sign convention of evaluate_board: positive favors black
+            self.best_score = score if self.engine.current_player == 'black' else -score
+            self.completed_depth = current_depth
+            self.stats.finish_iteration(current_depth, self.best_score, self.engine.move_to_str(best_move))
+            if self.on_iteration is not None:
+                self.on_iteration(self)
+
+            # Search the best move first in the next iteration
+            possible_moves.remove(best_move)
+            possible_moves.insert(0, best_move)
+
+            if abs(self.best_score) >= MATE_SCORE:
+                break  # A forced mate was found
+            if self.deadline is not None and time.time() - self.search_start > (self.deadline - self.search_start) / 2:
+                break  # The next iteration would not finish in time
+            if self.node_limit is not None and self.stats.nodes >= self.node_limit:
+                break  # Parallel searches only check the node budget between iterations
 
         return best_move
 
-    def choose_opening_move(self, key):
-        # Use the opening book to select a move
-        possible_responses = self.opening_book.get(key, [])
-        if possible_responses:
-            move_str = random.choice(possible_responses)
-            move = self.engine.parse_move_str(move_str)
-            if move in self.engine.generate_all_moves():
-                return move
-        return None
-
-    def minimax(self, depth, is_maximizing_player, alpha, beta):
-        if depth == 0 or self.engine.is_game_over():
-            return self.evaluate_board()
-
-        if is_maximizing_player:
-            max_eval = float('-inf')
-            moves = self.engine.generate_all_moves()
-            for move in moves:
-                self.engine.make_move(move)
-                eval = self.minimax(depth - 1, False, alpha, beta)
-                self.engine.undo_move()
-                max_eval = max(max_eval, eval)
-                alpha = max(alpha, eval)
-                if beta <= alpha:
-                    break  # Alpha-beta pruning
-            return max_eval
+    def time_budget(self, movetime=None, clock=None, increment=0):
+        # Seconds to spend on this move, or None to search to a fixed depth
+        if movetime is None and clock is None:
+            movetime = self.movetime
+        if movetime is not None:
+            return movetime
+        if clock is None:
+            return None
+        return min(clock / MOVES_TO_GO + increment * 0.8, clock / 2)
+
+    def begin_search(self, deadline=None, node_limit=None):
+        # Resets the budget and telemetry for a search from the current position
+        self.stop_search = False
+        self.deadline = deadline
+        self.node_limit = node_limit
+        self.completed_depth = 0
+        self.root_ply = self.engine.history_size
+        self.root_in_tablebase = self.tablebase_score() is not None
+        self.searching = True
+
+    def ponderhit(self, movetime=None, clock=None, increment=0, depth=None, nodes=None):
+        # Turns a running ponder search (started with no budget) into a normal search of
+        # this move: the time and node budgets count from now, and a depth limit that is
+        # already reached stops the search at once
+        budget = self.time_budget(movetime, clock, increment)
+        if budget is not None:
+            self.search_start = time.time()
+            self.deadline = self.search_start + budget
+        if nodes is not None:
+            self.node_limit = self.stats.nodes + nodes
+        if budget is None and nodes is None and depth is None:
+            depth = self.max_depth
+        if depth is not None:
+            self.depth_limit = depth
+            if self.completed_depth >= depth:
+                self.stop()
+
+    def stop(self):
+        # Ends the running search; choose_move returns the best move of the last completed iteration
+        self.stop_search = True
+
+    def start_parallel(self):
+        # Starts the worker pool when more than one worker is configured
+        if self.workers and self.workers > 1 and self.parallel is None:
+            from parallel_search import ParallelSearch
+            self.parallel = ParallelSearch(self.workers, self.engine.backend, self.tt_size_mb, self.features)
+
+    def close(self):
+        # Shuts down the worker pool of the parallel search, if one was started, and closes
+        # the opening book. Copies leave both to the AI they were copied from.
+        if self.is_copy:
+            return
+        if self.parallel is not None:
+            self.parallel.close()
+            self.parallel = None
+        self.close_opening_book()
+
+    def close_opening_book(self):
+        # Unmaps the book file, if one is open; it is opened again on the next book lookup
+        if self.opening_book is not None:
+            self.opening_book.close()
+            self.opening_book = None
+
+    def check_limits(self):
+        if self.deadline is not None and time.time() >= self.deadline:
+            self.stop_search = True
+        if self.shared_stop is not None and self.shared_stop.value:
+            self.stop_search = True
+        if self.node_limit is not None and self.stats.nodes >= self.node_limit:
+            self.stop_search = True
+
+    def aspiration_search(self, depth, moves, previous_score):
+        # Searches the root with a narrow window around the previous iteration's score,
+        # widening it whenever the result falls outside
+        if not self.features['aspiration'] or previous_score is None or abs(previous_score) >= TABLEBASE_WIN_SCORE:
+            return self.search_root(depth, moves, -INFINITY, INFINITY)
+        window = ASPIRATION_WINDOW
+        alpha = previous_score - window
+        beta = previous_score + window
+        while True:
+            result = self.search_root(depth, moves, alpha, beta)
+            if result is None:
+                return None
+            score = result[1]
+            if alpha < score < beta:
+                return result
+            self.stats.aspiration_researches += 1
+            window *= 4
+            if window > ASPIRATION_LIMIT:
+                alpha, beta = -INFINITY, INFINITY
+            elif score <= alpha:
+                alpha = score - window
+            else:
+                beta = score + window
+
+    def search_root(self, depth, moves, alpha, beta):
+        # Returns (best_move, best_value) with the value for the side to move, or None if
+        # the search was stopped
+        engine = self.engine
+        original_alpha = alpha
+        best_move = None
+        best_value = -INFINITY
+
+        for index, move in enumerate(moves):
+            engine.apply_move(move)
+            if index == 0 or not self.features['pvs']:
+                value = -self.negamax(depth - 1, -beta, -alpha)
+            else:
+                value = -self.negamax(depth - 1, -alpha - 1, -alpha)
+                if alpha < value < beta and not self.stop_search:
+                    self.stats.re_searches += 1
+                    value = -self.negamax(depth - 1, -beta, -alpha)
+            engine.undo_move()
+            if self.stop_search:
+                return None
+            if value > best_value:
+                best_value = value
+                best_move = move
+            alpha = max(alpha, value)
+            if alpha >= beta:
+                break
+
+        self.transposition_table.store(engine.zobrist_hash, depth, best_value,
+                                       self.bound_type(best_value, original_alpha, beta), best_move)
+        return best_move, best_value
+
+    def bound_type(self, value, alpha, beta):
+        if value <= alpha:
+            return UPPER_BOUND
+        if value >= beta:
+            return LOWER_BOUND
+        return EXACT
+
+    def hash_move(self):
+        # Best move stored for the current position, if any
+        entry = self.transposition_table.probe(self.engine.zobrist_hash)
+        return None if entry is None else entry[4]
+
+    def choose_opening_move(self):
+        # Use the opening book to select a move for the current position, by weight
+        if self.opening_book is None:
+            self.opening_book = self.load_opening_book()
+        return choose_book_move(self.opening_book, self.engine)
+
+    def negamax(self, depth, alpha, beta, allow_null=True):
+        # Score of the position for the side to move, searched to depth within (alpha, beta)
+        stats = self.stats
+        stats.nodes += 1
+        if stats.nodes % CHECK_INTERVAL == 0:
+            self.check_limits()
+        if self.stop_search:
+            return 0
+        engine = self.engine
+        sign = 1 if engine.current_player == 'black' else -1  # Turns black-positive scores into ours
+
+        if depth <= 0:
+            stats.leaf_evaluations += 1
+            start_time = time.perf_counter()
+            # Once the root itself is in a bitbase ending, the table ranks the leaves so the
+            # search keeps the win and still finds the mate
+            score = self.tablebase_score() if self.root_in_tablebase else None
+            if score is None:
+                score = self.evaluate_board()
+            stats.eval_seconds += time.perf_counter() - start_time
+            return sign * score
+
+        # Reuse the result of an earlier search of this position if it was deep enough
+        key = engine.zobrist_hash
+        entry = self.transposition_table.probe(key)
+        stats.tt_probes += 1
+        if entry is not None:
+            stats.tt_hits += 1
+        if entry is not None and entry[1] >= depth:
+            score, bound = entry[2], entry[3]
+            if bound == EXACT or (bound == LOWER_BOUND and score >= beta) or (bound == UPPER_BOUND and score <= alpha):
+                stats.tt_cutoffs += 1
+                return score
+        original_alpha = alpha
+
+        in_check = depth >= LMR_MIN_DEPTH and engine.is_in_check(engine.current_player)
+
+        # Null move: if passing the turn still fails high, a real move will too
+        if (allow_null and self.features['null_move'] and depth > NULL_MOVE_REDUCTION and not in_check
+                and beta < TABLEBASE_WIN_SCORE and self.has_pieces(engine.current_player)):
+            engine.apply_null_move()
+            score = -self.negamax(depth - 1 - NULL_MOVE_REDUCTION, -beta, -beta + 1, False)
+            engine.undo_move()
+            if self.stop_search:
+                return 0
+            if score >= beta and engine.phase <= NULL_MOVE_VERIFY_PHASE:
+                # Verify with a reduced normal search in case passing was only good in zugzwang
+                score = self.negamax(depth - 1 - NULL_MOVE_REDUCTION, beta - 1, beta, False)
+                if self.stop_search:
+                    return 0
+            if score >= beta:
+                stats.null_move_cutoffs += 1
+                return beta if score >= TABLEBASE_WIN_SCORE else score  # Unproven wins are not kept
+
+        start_time = time.perf_counter()
+        moves = engine.generate_all_moves()
+        stats.movegen_seconds += time.perf_counter() - start_time
+        if not moves:
+            # Checkmate or stalemate, detected lazily; prefer the quickest mate
+            if engine.is_in_check(engine.current_player):
+                return -(MATE_SCORE + depth)
+            return 0
+
+        # Entering a bitbase ending from a bigger one, the table result replaces the subtree
+        if not self.root_in_tablebase:
+            score = self.tablebase_score()
+            if score is not None:
+                return sign * score
+
+        ply = engine.history_size - self.root_ply
+        moves = self.move_orderer.order_moves(engine.board, moves, ply, None if entry is None else entry[4])
+        pvs = self.features['pvs']
+        lmr = self.features['lmr'] and depth >= LMR_MIN_DEPTH and not in_check
+
+        board = engine.board
+        best_move = None
+        best_value = -INFINITY
+        for index, move in enumerate(moves):
+            (start_row, start_col), (end_row, end_col) = move
+            quiet = board[end_row][end_col] == ' ' and not (
+                board[start_row][start_col] in 'Pp' and end_row in (0, 7))
+            engine.apply_move(move)
+            if index == 0:
+                value = -self.negamax(depth - 1, -beta, -alpha)
+            else:
+                # Quiet moves late in the ordering are unlikely to be best: search them
+                # shallower first, unless they give check
+                reduction = 0
+                if lmr and quiet and index >= LMR_MIN_MOVES and not engine.is_in_check(engine.current_player):
+                    reduction = 2 if index >= LMR_DEEP_MOVES else 1
+                    stats.reductions += 1
+                # Later moves only need to be proven worse than the best so far, which a
+                # zero window does fastest; the few that are not get a full re-search
+                window_alpha = -alpha - 1 if pvs else -beta
+                value = -self.negamax(depth - 1 - reduction, window_alpha, -alpha)
+                if reduction and value > alpha and not self.stop_search:
+                    stats.re_searches += 1
+                    value = -self.negamax(depth - 1, window_alpha, -alpha)
+                if pvs and alpha < value < beta and not self.stop_search:
+                    stats.re_searches += 1
+                    value = -self.negamax(depth - 1, -beta, -alpha)
+            engine.undo_move()
+            if self.stop_search:
+                return 0
+            if value > best_value:
+                best_value = value
+                best_move = move
+            alpha = max(alpha, value)
+            if alpha >= beta:
+                self.record_cutoff(move, depth, ply, index)
+                break  # Beta cutoff
+
+        self.transposition_table.store(key, depth, best_value, self.bound_type(best_value, original_alpha, beta),
+                                       best_move)
+        return best_value
+
+    def has_pieces(self, player):
+        # Whether the player has a piece other than pawns and the king
+        counts = self.engine.piece_counts
+        if player == 'white':
+            return counts['N'] or counts['B'] or counts['R'] or counts['Q']
+        return counts['n'] or counts['b'] or counts['r'] or counts['q']
+
+    def record_cutoff(self, move, depth, ply, index):
+        self.stats.beta_cutoffs += 1
+        if index == 0:
+            self.stats.first_move_cutoffs += 1
+        self.move_orderer.record_cutoff(self.engine.board, move, depth, ply)
+
+    def tablebase_score(self):
+        # Table score of the position, or None when no table covers it. A won position
+        # scores more the closer the mate is, so the search follows the table to mate.
+        engine = self.engine
+        if engine.phase > 4 or sum(engine.piece_counts.values()) > TABLEBASE_PIECES:
+            return None
+        found = self.tablebase.probe(engine)
+        if found is None:
+            return None
+        self.stats.tablebase_hits += 1
+        result, plies = found
+        if plies is None:
+            return 0
+        if result == WIN:
+            winner = engine.current_player
         else:
-            min_eval = float('inf')
-            moves = self.engine.generate_all_moves()
-            for move in moves:
-                self.engine.make_move(move)
-                eval = self.minimax(depth - 1, True, alpha, beta)
-                self.engine.undo_move()
-                min_eval = min(min_eval, eval)
-                beta = min(beta, eval)
-                if beta <= alpha:
-                    break  # Alpha-beta pruning
-            return min_eval
+            winner = 'black' if engine.current_player == 'white' else 'white'
+        score = TABLEBASE_WIN_SCORE + MAX_PLIES - plies
+        return score if winner == 'black' else -score
 
     def evaluate_board(self):
-        # Simple evaluation function
-        piece_values = {
-            'P': -1, 'N': -3, 'B': -3, 'R': -5, 'Q': -9, 'K': -100,
-            'p': 1, 'n': 3, 'b': 3, 'r': 5, 'q': 9, 'k': 100
-        }
-        total = 0
-        for row in self.engine.board:
-            for piece in row:
-                if piece != ' ':
-                    total += piece_values.get(piece, 0)
-        return total
+        # Material and piece-square terms are kept up to date by the engine, and the pawn
+        # structure term is looked up by pawn hash, so this is O(1) unless the pawns are new
+        engine = self.engine
+        entry = self.pawn_table.probe(engine.pawn_hash)
+        if entry is None:
+            self.stats.pawn_hash_misses += 1
+            pawn_mg, pawn_eg = evaluate_pawns(engine.board)
+            self.pawn_table.store(engine.pawn_hash, pawn_mg, pawn_eg)
+        else:
+            self.stats.pawn_hash_hits += 1
+            pawn_mg, pawn_eg = entry[1], entry[2]
+        score = tapered_score(engine.mg_score + pawn_mg, engine.eg_score + pawn_eg, engine.phase)
+        return -score  # Positive scores favor black
@@ -1,10 +1,95 @@
 # chess_engine.py
 
 import random
+from collections import OrderedDict
 from chess_ai import ChessAI
+from bitboard import (Bitboards, iter_squares, rook_attacks, bishop_attacks, KNIGHT_ATTACKS, KING_ATTACKS, PAWN_ATTACKS,
+                      KNIGHT_OFFSETS, KING_OFFSETS, ROOK_DIRECTIONS, BISHOP_DIRECTIONS)
+from zobrist import PIECE_KEYS, BLACK_TO_MOVE_KEY, compute_hash, compute_pawn_hash
+from evaluation import MG_TABLE, EG_TABLE, PHASE, evaluate_position
+
+# Position backends: 'mailbox' keeps only the board lists, 'bitboard' also keeps
+# 64-bit piece sets used for attack tests and move generation
+BACKENDS = ('mailbox', 'bitboard')
+
+
+def leaper_squares(offsets):
+    # For every square index, the (row, col) squares reached by the offsets
+    table = []
+    for square in range(64):
+        row, col = divmod(square, 8)
+        table.append([(row + d_row, col + d_col) for d_row, d_col in offsets
+                      if 0 <= row + d_row < 8 and 0 <= col + d_col < 8])
+    return table
+
+
+def slider_rays(directions):
+    # For every square index, one list of (row, col) squares per direction, nearest first
+    table = []
+    for square in range(64):
+        row, col = divmod(square, 8)
+        rays = []
+        for d_row, d_col in directions:
+            ray = []
+            r = row + d_row
+            c = col + d_col
+            while 0 <= r < 8 and 0 <= c < 8:
+                ray.append((r, c))
+                r += d_row
+                c += d_col
+            if ray:
+                rays.append(ray)
+        table.append(rays)
+    return table
+
+
+# Move generation tables, used both forward (moves) and backward (attacks on a square)
+KNIGHT_SQUARES = leaper_squares(KNIGHT_OFFSETS)
+KING_SQUARES = leaper_squares(KING_OFFSETS)
+STRAIGHT_RAYS = slider_rays(ROOK_DIRECTIONS)
+DIAGONAL_RAYS = slider_rays(BISHOP_DIRECTIONS)
+LEAPER_SQUARES = {
+    'N': KNIGHT_SQUARES,
+    'K': KING_SQUARES,
+}
+SLIDER_RAYS = {
+    'R': STRAIGHT_RAYS,
+    'B': DIAGONAL_RAYS,
+    'Q': [STRAIGHT_RAYS[square] + DIAGONAL_RAYS[square] for square in range(64)],
+}
+
+# Standard starting position
+START_FEN = 'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w - - 0 1'
+
+# Number of undo slots allocated up front; the stack grows past this on demand
+HISTORY_SLOTS = 128
+
+# Positions whose legal move lists are kept by ChessEngine.legal_moves
+MOVE_CACHE_SIZE = 1024
+
+class MoveRecord:
+    # One slot of the undo stack: only what a move changed, restored in place by undo_move
+    __slots__ = ('move', 'piece', 'captured', 'promoted', 'current_player', 'game_over', 'winner',
+                 'zobrist_hash', 'pawn_hash', 'mg_score', 'eg_score', 'phase')
 
-class ChessEngine:
     def __init__(self):
+        self.move = None
+        self.piece = ' '
+        self.captured = ' '
+        self.promoted = False
+        self.current_player = None
+        self.game_over = False
+        self.winner = None
+        self.zobrist_hash = 0
+        self.pawn_hash = 0
+        self.mg_score = 0
+        self.eg_score = 0
+        self.phase = 0
+
+class ChessEngine:
+    def __init__(self, backend='mailbox', move_cache_size=MOVE_CACHE_SIZE):
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown backend: {backend}")
         self.board = [
             ['r', 'n', 'b', 'q', 'k', 'b', 'n', 'r'],
             ['p', 'p', 'p', 'p', 'p', 'p', 'p', 'p'],
@@ -16,11 +101,120 @@ class ChessEngine:
             ['R', 'N', 'B', 'Q', 'K', 'B', 'N', 'R']
         ]
         self.current_player = 'white'  # 'white' or 'black'
+        self.start_move_number = 1  # Fullmove number of the position the move history starts from
         self.game_over = False
         self.winner = None
-        self.move_history = []
+        self.move_history = [MoveRecord() for _ in range(HISTORY_SLOTS)]
+        self.history_size = 0  # Number of slots of move_history in use
+        self.backend = backend
+        # LRU cache of legal move tuples keyed by (zobrist_hash, player). The hash covers the
+        # whole position, so entries stay valid through make/undo; 0 disables the cache.
+        self.move_cache = OrderedDict()
+        self.move_cache_size = move_cache_size
+        self.move_cache_hits = 0
+        self.move_cache_misses = 0
+        self.init_position_state()
         self.ai = ChessAI(self, max_depth=2)  # Adjust depth as needed
 
+    def init_position_state(self):
+        # Derives the incrementally updated state from board and current_player
+        self.start_board = [row[:] for row in self.board]  # Position the move history starts from
+        self.start_player = self.current_player
+        self.bitboards = Bitboards(self.board) if self.backend == 'bitboard' else None
+        self.zobrist_hash = compute_hash(self.board, self.current_player)  # Updated incrementally by apply_move
+        self.pawn_hash = compute_pawn_hash(self.board)  # Key of the pawns alone, for the pawn hash table
+        # Evaluation terms kept up to date by apply_move/undo_move, see evaluation.py
+        self.mg_score, self.eg_score, self.phase = evaluate_position(self.board)
+        self.piece_counts = dict.fromkeys('PNBRQKpnbrqk', 0)
+        for row in self.board:
+            for piece in row:
+                if piece != ' ':
+                    self.piece_counts[piece] += 1
+        # King squares, kept up to date by apply_move/undo_move
+        self.king_positions = {'white': self.locate_king('white'), 'black': self.locate_king('black')}
+        self.move_cache.clear()  # The board may have been edited without updating the hash
+
+    def load_fen(self, fen):
+        # Sets up the position of a FEN string. Castling rights, the en passant square and
+        # the halfmove clock are ignored since the engine does not implement those rules.
+        fields = fen.split()
+        ranks = fields[0].split('/') if fields else []
+        if len(ranks) != 8:
+            raise ValueError(f"Invalid FEN: {fen}")
+        board = []
+        for rank in ranks:
+            row = []
+            for char in rank:
+                if char.isdigit():
+                    row.extend([' '] * int(char))
+                elif char in 'PNBRQKpnbrqk':
+                    row.append(char)
+                else:
+                    raise ValueError(f"Invalid FEN: {fen}")
+            if len(row) != 8:
+                raise ValueError(f"Invalid FEN: {fen}")
+            board.append(row)
+        if sum(row.count('K') for row in board) != 1 or sum(row.count('k') for row in board) != 1:
+            raise ValueError(f"FEN must have exactly one king per side: {fen}")
+        if len(fields) > 1 and fields[1] not in ('w', 'b'):
+            raise ValueError(f"Invalid FEN: {fen}")
+        move_number = 1
+        if len(fields) > 5:
+            if not fields[5].isdigit():
+                raise ValueError(f"Invalid FEN: {fen}")
+            move_number = max(int(fields[5]), 1)
+
+        self.set_position(board, 'black' if len(fields) > 1 and fields[1] == 'b' else 'white', move_number)
+
+    def to_fen(self):
+        # FEN of the current position. There are never castling rights or an en passant
+        # square, and the halfmove clock is not tracked.
+        ranks = []
+        for row in self.board:
+            rank = ''
+            empty = 0
+            for piece in row:
+                if piece == ' ':
+                    empty += 1
+                    continue
+                if empty:
+                    rank += str(empty)
+                    empty = 0
+                rank += piece
+            if empty:
+                rank += str(empty)
+            ranks.append(rank)
+        plies = self.history_size + (1 if self.start_player == 'black' else 0)
+        side = 'w' if self.current_player == 'white' else 'b'
+        return f"{'/'.join(ranks)} {side} - - 0 {self.start_move_number + plies // 2}"
+
+    def set_position(self, board, current_player, move_number=1):
+        # Starts from the given board (a list of 8 rows) with an empty move history;
+        # move_number is the fullmove number of the position, as in FEN
+        self.board = [list(row) for row in board]
+        self.current_player = current_player
+        self.start_move_number = move_number
+        self.game_over = False
+        self.winner = None
+        self.history_size = 0
+        self.init_position_state()
+
+    def copy(self):
+        # Independent engine with the same position and move history; its AI shares
+        # this AI's settings and transposition table
+        clone = ChessEngine(self.backend, self.move_cache_size)
+        clone.set_position(self.start_board, self.start_player, self.start_move_number)
+        for record in self.move_history[:self.history_size]:
+            if record.move is None:
+                clone.apply_null_move()
+            else:
+                clone.apply_move(record.move)
+        clone.game_over = self.game_over
+        clone.winner = self.winner
+        clone.move_cache = OrderedDict(self.move_cache)  # A copy, so threads never share one
+        clone.ai = self.ai.copy_for(clone)
+        return clone
+
     def is_valid_move(self, start, end):
         if self.game_over:
             return False
@@ -90,35 +284,82 @@ class ChessEngine:
 
         self.board[end[0]][end[1]] = piece
         self.board[start[0]][start[1]] = ' '
+        if self.bitboards is not None:
+            self.move_on_bitboards(piece, start, end, captured_piece, piece)
 
         # Check if own king is under attack
-        king_position = self.find_king(player)
+        king_position = end if piece.upper() == 'K' else self.find_king(player)
         in_check = self.square_under_attack(king_position, player)
 
         # Undo the move
         self.board[start[0]][start[1]] = piece
         self.board[end[0]][end[1]] = captured_piece
+        if self.bitboards is not None:
+            self.unmove_on_bitboards(piece, start, end, captured_piece, piece)
 
         return in_check
 
     def undo_move(self):
-        if not self.move_history:
+        if self.history_size == 0:
+            return
+        self.history_size -= 1
+        record = self.move_history[self.history_size]
+        if record.move is None:
+            # Null move: only the side to move changed
+            self.current_player = record.current_player
+            self.zobrist_hash = record.zobrist_hash
             return
-        last_state = self.move_history.pop()
-        self.board = last_state['board']
-        self.current_player = last_state['current_player']
-        self.game_over = last_state['game_over']
-        self.winner = last_state['winner']
+
+        (start_row, start_col), (end_row, end_col) = record.move
+        placed_piece = self.board[end_row][end_col]
+        if self.bitboards is not None:
+            self.unmove_on_bitboards(record.piece, record.move[0], record.move[1], record.captured, placed_piece)
+        self.board[start_row][start_col] = record.piece
+        self.board[end_row][end_col] = record.captured
+
+        self.current_player = record.current_player
+        self.game_over = record.game_over
+        self.winner = record.winner
+        self.zobrist_hash = record.zobrist_hash
+        self.pawn_hash = record.pawn_hash
+        self.mg_score = record.mg_score
+        self.eg_score = record.eg_score
+        self.phase = record.phase
+        if record.captured != ' ':
+            self.piece_counts[record.captured] += 1
+        if record.promoted:
+            self.piece_counts[placed_piece] -= 1
+            self.piece_counts[record.piece] += 1
+        if record.piece == 'K':
+            self.king_positions['white'] = record.move[0]
+        elif record.piece == 'k':
+            self.king_positions['black'] = record.move[0]
 
     def copy_board(self):
         return [row[:] for row in self.board]
+
+    def move_on_bitboards(self, piece, start, end, captured_piece, placed_piece):
+        # Mirrors a board update on the bitboard backend; placed_piece differs from piece on promotion
+        start_square = start[0] * 8 + start[1]
+        end_square = end[0] * 8 + end[1]
+        self.bitboards.remove(piece, start_square)
+        if captured_piece != ' ':
+            self.bitboards.remove(captured_piece, end_square)
+        self.bitboards.put(placed_piece, end_square)
+
+    def unmove_on_bitboards(self, piece, start, end, captured_piece, placed_piece):
+        start_square = start[0] * 8 + start[1]
+        end_square = end[0] * 8 + end[1]
+        self.bitboards.remove(placed_piece, end_square)
+        if captured_piece != ' ':
+            self.bitboards.put(captured_piece, end_square)
+        self.bitboards.put(piece, start_square)
     
     def get_moves_made(self):
         # Returns a list of move strings
         moves_made = []
-        for state in self.move_history:
-            move = state['move']
-            move_str = self.move_to_str(move)
+        for record in self.move_history[:self.history_size]:
+            move_str = self.move_to_str(record.move)
             moves_made.append(move_str)
         return moves_made
 
@@ -139,76 +380,51 @@ class ChessEngine:
 
     def square_under_attack(self, position, player):
         opponent = 'black' if player == 'white' else 'white'
-        for row in range(8):
-            for col in range(8):
-                piece = self.board[row][col]
-                if piece != ' ':
-                    if (opponent == 'white' and piece.isupper()) or (opponent == 'black' and piece.islower()):
-                        if self.is_valid_attack_move((row, col), position, opponent):
-                            return True
+        row, col = position
+        square = row * 8 + col
+        if self.bitboards is not None:
+            return self.bitboards.is_attacked(square, opponent)
+
+        # Work backward from the square: look only where an attacker could stand
+        board = self.board
+        if opponent == 'white':
+            pawn_row = row + 1  # White pawns attack towards row 0
+            pawn, knight, bishop, rook, queen, king = 'P', 'N', 'B', 'R', 'Q', 'K'
+        else:
+            pawn_row = row - 1
+            pawn, knight, bishop, rook, queen, king = 'p', 'n', 'b', 'r', 'q', 'k'
+
+        if 0 <= pawn_row < 8:
+            if col > 0 and board[pawn_row][col - 1] == pawn:
+                return True
+            if col < 7 and board[pawn_row][col + 1] == pawn:
+                return True
+        for r, c in KNIGHT_SQUARES[square]:
+            if board[r][c] == knight:
+                return True
+        for r, c in KING_SQUARES[square]:
+            if board[r][c] == king:
+                return True
+        for ray in STRAIGHT_RAYS[square]:
+            for r, c in ray:
+                target = board[r][c]
+                if target != ' ':
+                    if target == rook or target == queen:
+                        return True
+                    break
+        for ray in DIAGONAL_RAYS[square]:
+            for r, c in ray:
+                target = board[r][c]
+                if target != ' ':
+                    if target == bishop or target == queen:
+                        return True
+                    break
         return False
 
     def is_valid_move(self, start, end, player=None):
         if self.game_over:
             return False
-
-        if player is None:
-            player = self.current_player
-
-        start_row, start_col = start
-        end_row, end_col = end
-
-        # Check if the coordinates are within the board
-        if not (0 <= end_row < 8 and 0 <= end_col < 8):
-            return False
-
-        piece = self.board[start_row][start_col]
-        target = self.board[end_row][end_col]
-
-        if piece == ' ':
-            return False
-
-        # Determine player's color
-        if player == 'white' and not piece.isupper():
-            return False
-        if player == 'black' and not piece.islower():
-            return False
-
-        # Prevent capturing own pieces
-        if target != ' ':
-            if piece.isupper() and target.isupper():
-                return False
-            if piece.islower() and target.islower():
-                return False
-
-        # Implement specific piece movement logic
-        if piece.upper() == 'P':  # Pawn movement
-            if not self.is_valid_pawn_move(start, end, piece):
-                return False
-        elif piece.upper() == 'R':  # Rook movement
-            if not self.is_valid_straight_line_move(start, end):
-                return False
-        elif piece.upper() == 'N':  # Knight movement
-            if not self.is_valid_knight_move(start, end):
-                return False
-        elif piece.upper() == 'B':  # Bishop movement
-            if not self.is_valid_diagonal_move(start, end):
-                return False
-        elif piece.upper() == 'Q':  # Queen movement
-            if not (self.is_valid_straight_line_move(start, end) or self.is_valid_diagonal_move(start, end)):
-                return False
-        elif piece.upper() == 'K':  # King movement
-            if not self.is_valid_king_move(start, end):
-                return False
-            # Prevent the king from moving into a threatened square
-            if self.square_under_attack((end_row, end_col), player):
-                return False
-
-        # Prevent moving into check
-        if self.move_causes_check(start, end, player):
-            return False
-
-        return True
+        return (tuple(start), tuple(end)) in self.legal_moves(player)
 
     def is_valid_attack_move(self, start, end, player=None):
         if player is None:
@@ -250,20 +466,44 @@ class ChessEngine:
         if self.game_over or move is None:
             return
 
-        (start_row, start_col), (end_row, end_col) = move
+        self.apply_move(move)
+
+        # After the move, check if the player to move is in checkmate or stalemate. The
+        # move list is cached, so the next turn's move generation reuses it.
+        player = self.current_player
+        if not self.legal_moves(player):
+            self.game_over = True
+            if self.is_in_check(player):
+                self.winner = 'black' if player == 'white' else 'white'  # The player who just moved wins
+            else:
+                self.winner = 'draw'
 
-        # Save the current state and the move
-        self.move_history.append({
-            'board': self.copy_board(),
-            'current_player': self.current_player,
-            'game_over': self.game_over,
-            'winner': self.winner,
-            'move': move
-        })
+    def apply_move(self, move):
+        # Search entry point: plays the move without checkmate/stalemate detection,
+        # the search finds terminal positions itself when a node has no legal moves
+        (start_row, start_col), (end_row, end_col) = move
 
         piece = self.board[start_row][start_col]
         captured_piece = self.board[end_row][end_col]
 
+        # Record only what the move changes in the next free undo slot
+        if self.history_size == len(self.move_history):
+            self.move_history.append(MoveRecord())
+        record = self.move_history[self.history_size]
+        self.history_size += 1
+        record.move = move
+        record.piece = piece
+        record.captured = captured_piece
+        record.promoted = False
+        record.current_player = self.current_player
+        record.game_over = self.game_over
+        record.winner = self.winner
+        record.zobrist_hash = self.zobrist_hash
+        record.pawn_hash = self.pawn_hash
+        record.mg_score = self.mg_score
+        record.eg_score = self.eg_score
+        record.phase = self.phase
+
         self.board[end_row][end_col] = piece
         self.board[start_row][start_col] = ' '
 
@@ -271,44 +511,77 @@ class ChessEngine:
         if piece.upper() == 'P':
             if (piece.isupper() and end_row == 0) or (piece.islower() and end_row == 7):
                 self.board[end_row][end_col] = 'Q' if piece.isupper() else 'q'
-
-        # After the move, check if the opponent is in checkmate or stalemate
-        opponent = 'black' if self.current_player == 'white' else 'white'
-        if self.is_in_checkmate(opponent):
-            self.game_over = True
-            self.winner = self.current_player  # The player who just moved wins
-        elif self.is_stalemate(opponent):
-            self.game_over = True
-            self.winner = 'draw'
+                record.promoted = True
+
+        placed_piece = self.board[end_row][end_col]
+        if self.bitboards is not None:
+            self.move_on_bitboards(piece, move[0], move[1], captured_piece, placed_piece)
+
+        # Update the position hash
+        start_square = start_row * 8 + start_col
+        end_square = end_row * 8 + end_col
+        key = self.zobrist_hash ^ PIECE_KEYS[piece][start_square] ^ PIECE_KEYS[placed_piece][end_square]
+        if captured_piece != ' ':
+            key ^= PIECE_KEYS[captured_piece][end_square]
+        self.zobrist_hash = key ^ BLACK_TO_MOVE_KEY
+        if piece == 'P' or piece == 'p':
+            self.pawn_hash ^= PIECE_KEYS[piece][start_square]
+            if placed_piece == piece:
+                self.pawn_hash ^= PIECE_KEYS[piece][end_square]
+        if captured_piece == 'P' or captured_piece == 'p':
+            self.pawn_hash ^= PIECE_KEYS[captured_piece][end_square]
+
+        # Update the evaluation terms
+        self.mg_score += MG_TABLE[placed_piece][end_square] - MG_TABLE[piece][start_square]
+        self.eg_score += EG_TABLE[placed_piece][end_square] - EG_TABLE[piece][start_square]
+        if captured_piece != ' ':
+            self.mg_score -= MG_TABLE[captured_piece][end_square]
+            self.eg_score -= EG_TABLE[captured_piece][end_square]
+            self.phase -= PHASE[captured_piece]
+            self.piece_counts[captured_piece] -= 1
+        if placed_piece != piece:
+            self.phase += PHASE[placed_piece]
+            self.piece_counts[piece] -= 1
+            self.piece_counts[placed_piece] += 1
+        if piece == 'K':
+            self.king_positions['white'] = move[1]
+        elif piece == 'k':
+            self.king_positions['black'] = move[1]
 
         # Switch player
-        self.current_player = opponent
+        self.current_player = 'black' if self.current_player == 'white' else 'white'
+
+    def apply_null_move(self):
+        # Passes the turn, for null-move pruning in the search; undone by undo_move
+        if self.history_size == len(self.move_history):
+            self.move_history.append(MoveRecord())
+        record = self.move_history[self.history_size]
+        self.history_size += 1
+        record.move = None
+        record.current_player = self.current_player
+        record.zobrist_hash = self.zobrist_hash
+        self.zobrist_hash ^= BLACK_TO_MOVE_KEY
+        self.current_player = 'black' if self.current_player == 'white' else 'white'
 
     def is_in_checkmate(self, player):
         if not self.is_in_check(player):
             return False
         # Check if player has any valid moves
-        for row in range(8):
-            for col in range(8):
-                piece = self.board[row][col]
-                if piece != ' ' and ((player == 'white' and piece.isupper()) or (player == 'black' and piece.islower())):
-                    moves = self.get_possible_moves((row, col), player)
-                    if moves:
-                        return False
-        return True  # No valid moves and in check
+        return not self.has_legal_moves(player)  # No valid moves and in check
 
     def is_stalemate(self, player):
         if self.is_in_check(player):
             return False
         # Check if player has any valid moves
-        for row in range(8):
-            for col in range(8):
-                piece = self.board[row][col]
-                if piece != ' ' and ((player == 'white' and piece.isupper()) or (player == 'black' and piece.islower())):
-                    moves = self.get_possible_moves((row, col), player)
-                    if moves:
-                        return False
-        return True  # No valid moves and not in check
+        return not self.has_legal_moves(player)  # No valid moves and not in check
+
+    def has_legal_moves(self, player):
+        moves = self.move_cache.get((self.zobrist_hash, player))
+        if moves is not None:
+            return bool(moves)
+        for _ in self.iter_legal_moves(player):
+            return True
+        return False
 
     def is_in_check(self, player):
         king_position = self.find_king(player)
@@ -318,6 +591,10 @@ class ChessEngine:
         return self.square_under_attack(king_position, player)
 
     def find_king(self, player):
+        return self.king_positions[player]
+
+    def locate_king(self, player):
+        # Scans the board; find_king returns the tracked square instead
         king = 'K' if player == 'white' else 'k'
         for row in range(8):
             for col in range(8):
@@ -329,42 +606,256 @@ class ChessEngine:
         if player is None:
             player = self.current_player
 
-        possible_moves = []
+        if self.game_over:
+            return []
+
+        position = tuple(position)
+        return [end for start, end in self.legal_moves(player) if start == position]
+
+    def find_checks_and_pins(self, player):
+        # Returns (evasions, pins) for player's king, computed once per position:
+        # evasions is None when not in check, otherwise the squares a non-king move
+        # must land on (capture or block the checker; empty in double check).
+        # pins maps each absolutely pinned piece to the squares of its pin ray.
+        board = self.board
+        king_row, king_col = self.king_positions[player]
+        king_square = king_row * 8 + king_col
+        is_white = player == 'white'
+        if is_white:
+            pawn_row = king_row - 1  # Black pawns giving check stand one row towards row 0
+            pawn, knight, bishop, rook, queen = 'p', 'n', 'b', 'r', 'q'
+        else:
+            pawn_row = king_row + 1
+            pawn, knight, bishop, rook, queen = 'P', 'N', 'B', 'R', 'Q'
+
+        checks = []
+        pins = {}
+        for rays, slider in ((STRAIGHT_RAYS, rook), (DIAGONAL_RAYS, bishop)):
+            for ray in rays[king_square]:
+                own_piece = None
+                for index, (r, c) in enumerate(ray):
+                    target = board[r][c]
+                    if target == ' ':
+                        continue
+                    if target.isupper() == is_white:
+                        if own_piece is not None:
+                            break  # Two own pieces shield the king
+                        own_piece = (r, c)
+                        continue
+                    if target == slider or target == queen:
+                        squares = set(ray[:index + 1])
+                        if own_piece is None:
+                            checks.append(squares)
+                        else:
+                            pins[own_piece] = squares
+                    break
+        for r, c in KNIGHT_SQUARES[king_square]:
+            if board[r][c] == knight:
+                checks.append({(r, c)})
+        if 0 <= pawn_row < 8:
+            for c in (king_col - 1, king_col + 1):
+                if 0 <= c < 8 and board[pawn_row][c] == pawn:
+                    checks.append({(pawn_row, c)})
+
+        if not checks:
+            evasions = None
+        elif len(checks) == 1:
+            evasions = checks[0]
+        else:
+            evasions = set()  # Double check: only the king can move
+        return evasions, pins
+
+    def legal_targets(self, position, player, evasions, pins):
+        # Yields the legal destinations of the piece on position given find_checks_and_pins
+        row, col = position
+        if self.board[row][col].upper() == 'K':
+            # Only king moves need a full attack test
+            for end in self.generate_piece_targets(position, player):
+                if not self.move_causes_check(position, end, player):
+                    yield end
+            return
+        if evasions is not None and not evasions:
+            return
+        pin_ray = pins.get(position)
+        for end in self.generate_piece_targets(position, player):
+            if evasions is not None and end not in evasions:
+                continue
+            if pin_ray is not None and end not in pin_ray:
+                continue
+            yield end
+
+    def iter_legal_moves(self, player=None):
+        if player is None:
+            player = self.current_player
+        if self.bitboards is not None:
+            yield from self.iter_bitboard_legal_moves(player)
+            return
+        evasions, pins = self.find_checks_and_pins(player)
+        is_white = player == 'white'
         for row in range(8):
             for col in range(8):
-                if self.is_valid_move(position, (row, col), player):
-                    possible_moves.append((row, col))
-        return possible_moves
+                piece = self.board[row][col]
+                if piece != ' ' and piece.isupper() == is_white:
+                    start = (row, col)
+                    for end in self.legal_targets(start, player, evasions, pins):
+                        yield (start, end)
+
+    def iter_bitboard_legal_moves(self, player):
+        # iter_legal_moves on the bitboard backend: checks, pins and king safety come from
+        # attack masks instead of walking the board, and moves come out in the same order
+        bitboards = self.bitboards
+        pieces = bitboards.pieces
+        own = bitboards.occupancy[player]
+        if player == 'white':
+            opponent = 'black'
+            king, pawn, knight, bishop, rook, queen = 'K', 'p', 'n', 'b', 'r', 'q'
+        else:
+            opponent = 'white'
+            king, pawn, knight, bishop, rook, queen = 'k', 'P', 'N', 'B', 'R', 'Q'
+        enemy = bitboards.occupancy[opponent]
+        king_square = bitboards.find(king)
+
+        checkers = PAWN_ATTACKS[player][king_square] & pieces[pawn] | KNIGHT_ATTACKS[king_square] & pieces[knight]
+        check_rays = 0
+        pins = {}  # Square of a pinned piece -> mask of the squares it may move to
+        for attacks, sliders in ((rook_attacks, pieces[rook] | pieces[queen]),
+                                 (bishop_attacks, pieces[bishop] | pieces[queen])):
+            # Enemy sliders in line with the king when looking through own pieces
+            for slider in iter_squares(attacks(king_square, enemy) & sliders):
+                between = attacks(king_square, 1 << slider) & attacks(slider, 1 << king_square)
+                blockers = between & own
+                if not blockers:
+                    checkers |= 1 << slider
+                    check_rays |= between
+                elif not blockers & (blockers - 1):
+                    pins[blockers.bit_length() - 1] = between | 1 << slider
+        if not checkers:
+            evasions = None
+        elif not checkers & (checkers - 1):
+            evasions = checkers | check_rays
+        else:
+            evasions = 0  # Double check: only the king can move
+
+        # The king is lifted off the board so it cannot shield itself from a slider
+        occupied = bitboards.occupied
+        bitboards.occupied = occupied & ~(1 << king_square)
+        king_targets = [target for target in iter_squares(KING_ATTACKS[king_square] & ~own)
+                        if not bitboards.is_attacked(target, opponent)]
+        bitboards.occupied = occupied
+
+        board = self.board
+        for square in iter_squares(own):
+            start = (square >> 3, square & 7)
+            if square == king_square:
+                for target in king_targets:
+                    yield start, (target >> 3, target & 7)
+                continue
+            if evasions == 0:
+                continue
+            targets = bitboards.targets(board[start[0]][start[1]], square)
+            if evasions is not None:
+                targets &= evasions
+            if square in pins:
+                targets &= pins[square]
+            for target in iter_squares(targets):
+                yield start, (target >> 3, target & 7)
+
+    def generate_piece_targets(self, position, player=None):
+        # Yields the squares the piece on position can reach, ignoring checks
+        if player is None:
+            player = self.current_player
+
+        row, col = position
+        piece = self.board[row][col]
+        if piece == ' ':
+            return
+        is_white = piece.isupper()
+        if is_white != (player == 'white'):
+            return
+
+        if self.bitboards is not None:
+            for square in iter_squares(self.bitboards.targets(piece, row * 8 + col)):
+                yield divmod(square, 8)
+            return
+
+        board = self.board
+        kind = piece.upper()
+
+        if kind == 'P':
+            direction = -1 if is_white else 1
+            next_row = row + direction
+            if not 0 <= next_row < 8:
+                return
+            # Move forward, with the double move from the starting position
+            if board[next_row][col] == ' ':
+                yield (next_row, col)
+                start_row = 6 if is_white else 1
+                if row == start_row and board[next_row + direction][col] == ' ':
+                    yield (next_row + direction, col)
+            # Capture diagonally
+            for next_col in (col - 1, col + 1):
+                if 0 <= next_col < 8:
+                    target = board[next_row][next_col]
+                    if target != ' ' and target.isupper() != is_white:
+                        yield (next_row, next_col)
+        elif kind in LEAPER_SQUARES:
+            for r, c in LEAPER_SQUARES[kind][row * 8 + col]:
+                target = board[r][c]
+                if target == ' ' or target.isupper() != is_white:
+                    yield (r, c)
+        else:
+            for ray in SLIDER_RAYS[kind][row * 8 + col]:
+                for r, c in ray:
+                    target = board[r][c]
+                    if target != ' ':
+                        if target.isupper() != is_white:
+                            yield (r, c)
+                        break
+                    yield (r, c)
 
     def ai_move(self):
+        # The AI plays a move for the side to move
         if self.game_over:
             return
+        self.play_ai_move(self.ai.choose_move())
 
-        # Ensure current_player is 'black' before generating moves
-        self.current_player = 'black'
-
-        move = self.ai.choose_move()
+    def play_ai_move(self, move):
+        # Plays the move the AI chose for the side to move, or ends the game if it had none
         if move:
             self.make_move(move)
         else:
             # AI has no legal moves
-            if self.is_in_check('black'):
-                self.game_over = True
-                self.winner = 'white'  # Player wins
+            self.game_over = True
+            if self.is_in_check(self.current_player):
+                self.winner = 'black' if self.current_player == 'white' else 'white'
             else:
-                self.game_over = True
                 self.winner = 'draw'
 
-
     def generate_all_moves(self):
-        moves = []
-        for row in range(8):
-            for col in range(8):
-                piece = self.board[row][col]
-                if piece != ' ' and ((self.current_player == 'white' and piece.isupper()) or (self.current_player == 'black' and piece.islower())):
-                    start = (row, col)
-                    for end in self.get_possible_moves(start):
-                        moves.append((start, end))
+        if self.game_over:
+            return []
+        return list(self.legal_moves(self.current_player))
+
+    def legal_moves(self, player=None):
+        # Tuple of player's legal moves, generated at most once per position while it
+        # stays in the cache
+        if player is None:
+            player = self.current_player
+        if not self.move_cache_size:
+            return tuple(self.iter_legal_moves(player))
+        key = (self.zobrist_hash, player)
+        cache = self.move_cache
+        moves = cache.get(key)
+        if moves is not None:
+            cache.move_to_end(key)
+            self.move_cache_hits += 1
+            return moves
+        self.move_cache_misses += 1
+        moves = tuple(self.iter_legal_moves(player))
+        if self.move_cache_size > 0:
+            cache[key] = moves
+            if len(cache) > self.move_cache_size:
+                cache.popitem(last=False)  # Least recently used
         return moves
 
     def is_game_over(self):
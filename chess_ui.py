@@ -3,6 +3,7 @@
 import tkinter as tk
 from tkinter import messagebox
 from chess_engine import ChessEngine
+from search_worker import SearchWorker
 
 # Constants
 BOARD_SIZE = 8
@@ -13,6 +14,12 @@ PIECES = {
 }
 HIGHLIGHT_COLOR = 'yellow'
 MOVE_HIGHLIGHT_COLOR = 'light blue'
+LAST_MOVE_COLOR = 'pale green'
+ANIMATION_FRAMES = 10  # Steps a piece takes to slide to its new square
+ANIMATION_DELAY = 15  # Milliseconds between animation steps
+AI_MOVETIME = None  # Seconds per AI move; None searches to the engine's max_depth
+POLL_INTERVAL = 50  # Milliseconds between checks on the background search
+PONDER = True  # Search the expected reply while the player thinks
 
 class ChessUI:
     def __init__(self, root):
@@ -21,40 +28,100 @@ class ChessUI:
         self.engine = ChessEngine()
         self.canvas = tk.Canvas(root, width=BOARD_SIZE * SQUARE_SIZE, height=BOARD_SIZE * SQUARE_SIZE)
         self.canvas.pack()
+        self.status = tk.Label(root, text="Your move")
+        self.status.pack()
+        buttons = tk.Frame(root)
+        buttons.pack()
+        self.move_now_button = tk.Button(buttons, text="Move now", command=self.move_now, state=tk.DISABLED)
+        self.move_now_button.pack(side=tk.LEFT)
+        self.cancel_button = tk.Button(buttons, text="Cancel", command=self.cancel_search, state=tk.DISABLED)
+        self.cancel_button.pack(side=tk.LEFT)
         self.selected_piece = None
         self.possible_moves = []
+        self.search_worker = None  # Background AI search, while the AI is thinking
+        self.ponder_worker = None  # Background search of the expected reply, while the player thinks
+        self.animating = False
+        self.create_board_items()
         self.draw_board()
         self.canvas.bind("<Button-1>", self.on_click)
 
-    def draw_board(self):
-        self.canvas.delete("all")
+    def create_board_items(self):
+        # Canvas items are created once and reconfigured in place by draw_board
+        self.square_items = []
+        self.piece_items = []
+        self.drawn_colors = [[None] * BOARD_SIZE for _ in range(BOARD_SIZE)]
+        self.drawn_pieces = [[' '] * BOARD_SIZE for _ in range(BOARD_SIZE)]
         for row in range(BOARD_SIZE):
+            self.square_items.append([])
             for col in range(BOARD_SIZE):
-                # Determine square color
-                color = 'white' if (row + col) % 2 == 0 else 'gray'
                 x1 = col * SQUARE_SIZE
                 y1 = row * SQUARE_SIZE
-                x2 = x1 + SQUARE_SIZE
-                y2 = y1 + SQUARE_SIZE
-
-                # Draw the square
-                self.canvas.create_rectangle(x1, y1, x2, y2, fill=color)
-
-                # Highlight the selected piece
-                if self.selected_piece == (row, col):
-                    self.canvas.create_rectangle(x1, y1, x2, y2, fill=HIGHLIGHT_COLOR)
-
-                # Highlight possible moves
-                if (row, col) in self.possible_moves:
-                    self.canvas.create_rectangle(x1, y1, x2, y2, fill=MOVE_HIGHLIGHT_COLOR)
+                self.square_items[row].append(
+                    self.canvas.create_rectangle(x1, y1, x1 + SQUARE_SIZE, y1 + SQUARE_SIZE))
+        # Pieces are created after all squares so they stay on top
+        for row in range(BOARD_SIZE):
+            self.piece_items.append([])
+            for col in range(BOARD_SIZE):
+                x = col * SQUARE_SIZE + SQUARE_SIZE // 2
+                y = row * SQUARE_SIZE + SQUARE_SIZE // 2
+                self.piece_items[row].append(self.canvas.create_text(x, y, text='', font=("Arial", 24)))
+        self.animation_item = self.canvas.create_text(0, 0, text='', font=("Arial", 24), state=tk.HIDDEN)
+
+    def square_color(self, row, col, last_move):
+        # Highlight the selected piece, then possible moves, then the last move
+        if self.selected_piece == (row, col):
+            return HIGHLIGHT_COLOR
+        if (row, col) in self.possible_moves:
+            return MOVE_HIGHLIGHT_COLOR
+        if last_move is not None and (row, col) in last_move:
+            return LAST_MOVE_COLOR
+        return 'white' if (row + col) % 2 == 0 else 'gray'
 
-                # Draw the piece
-                piece = self.engine.board[row][col]
-                if piece != ' ':
-                    self.canvas.create_text(x1 + SQUARE_SIZE // 2, y1 + SQUARE_SIZE // 2,
-                                            text=PIECES[piece], font=("Arial", 24))
+    def draw_board(self):
+        # Updates only the squares whose color or piece changed since the last call
+        engine = self.engine
+        last_move = engine.move_history[engine.history_size - 1].move if engine.history_size else None
+        for row in range(BOARD_SIZE):
+            for col in range(BOARD_SIZE):
+                color = self.square_color(row, col, last_move)
+                if color != self.drawn_colors[row][col]:
+                    self.canvas.itemconfig(self.square_items[row][col], fill=color)
+                    self.drawn_colors[row][col] = color
+
+                piece = engine.board[row][col]
+                if piece != self.drawn_pieces[row][col]:
+                    text = PIECES[piece] if piece != ' ' else ''
+                    self.canvas.itemconfig(self.piece_items[row][col], text=text)
+                    self.drawn_pieces[row][col] = piece
+
+    def animate_move(self, move, on_done):
+        # Slides the piece of a move that was already made from its start to its end square
+        (start_row, start_col), (end_row, end_col) = move
+        piece = self.engine.board[end_row][end_col]
+        self.animating = True
+        self.canvas.itemconfig(self.piece_items[start_row][start_col], text='')
+        self.drawn_pieces[start_row][start_col] = ' '
+        self.canvas.coords(self.animation_item,
+                           start_col * SQUARE_SIZE + SQUARE_SIZE // 2, start_row * SQUARE_SIZE + SQUARE_SIZE // 2)
+        self.canvas.itemconfig(self.animation_item, text=PIECES[piece], state=tk.NORMAL)
+        self.canvas.tag_raise(self.animation_item)
+        step_x = (end_col - start_col) * SQUARE_SIZE / ANIMATION_FRAMES
+        step_y = (end_row - start_row) * SQUARE_SIZE / ANIMATION_FRAMES
+        self.animation_step(ANIMATION_FRAMES, step_x, step_y, on_done)
+
+    def animation_step(self, frames_left, step_x, step_y, on_done):
+        if frames_left == 0:
+            self.canvas.itemconfig(self.animation_item, state=tk.HIDDEN)
+            self.animating = False
+            self.draw_board()
+            on_done()
+            return
+        self.canvas.move(self.animation_item, step_x, step_y)
+        self.root.after(ANIMATION_DELAY, self.animation_step, frames_left - 1, step_x, step_y, on_done)
 
     def on_click(self, event):
+        if self.search_worker is not None or self.animating:
+            return  # Wait for the AI's move
         if self.engine.is_game_over():
             self.show_game_over()
             return
@@ -75,13 +142,8 @@ class ChessUI:
                     self.show_game_over()
                     return
 
-                # AI makes a move
-                self.engine.ai_move()
-                self.draw_board()
-
-                # Check if game is over after AI's move
-                if self.engine.is_game_over():
-                    self.show_game_over()
+                # AI makes a move in the background
+                self.start_ai_turn()
             else:
                 # Deselect if move is invalid
                 self.selected_piece = None
@@ -95,6 +157,76 @@ class ChessUI:
                 self.possible_moves = self.engine.get_possible_moves(self.selected_piece)
                 self.draw_board()
 
+    def start_ai_turn(self):
+        search_args = {} if AI_MOVETIME is None else {'movetime': AI_MOVETIME}
+        ponder_worker = self.ponder_worker
+        self.ponder_worker = None
+        last_move = self.engine.move_history[self.engine.history_size - 1].move
+        if ponder_worker is not None and ponder_worker.ponder_move == last_move:
+            # The player made the expected move: keep the search that is already running
+            ponder_worker.ponderhit(**search_args)
+            self.search_worker = ponder_worker
+        else:
+            if ponder_worker is not None:
+                ponder_worker.cancel()  # Its transposition table entries are kept
+            self.search_worker = SearchWorker(self.engine, **search_args).start()
+        self.move_now_button.config(state=tk.NORMAL)
+        self.cancel_button.config(state=tk.NORMAL)
+        self.status.config(text="AI is thinking...")
+        self.root.after(POLL_INTERVAL, self.poll_ai)
+
+    def poll_ai(self):
+        worker = self.search_worker
+        if worker is None:
+            return
+        if not worker.done:
+            depth, nodes = worker.progress()
+            self.status.config(text=f"AI is thinking... depth {depth}, {nodes} nodes")
+            self.root.after(POLL_INTERVAL, self.poll_ai)
+            return
+
+        self.search_worker = None
+        self.move_now_button.config(state=tk.DISABLED)
+        self.cancel_button.config(state=tk.DISABLED)
+        if worker.cancelled:
+            # Take back the player's move so they can choose another
+            self.engine.undo_move()
+            self.status.config(text="Search cancelled. Your move")
+            self.draw_board()
+            if PONDER:
+                self.start_pondering()
+            return
+
+        self.engine.play_ai_move(worker.move)
+        if worker.move:
+            self.animate_move(worker.move, self.finish_ai_turn)
+        else:
+            self.draw_board()
+            self.finish_ai_turn()
+
+    def finish_ai_turn(self):
+        self.status.config(text="Your move")
+
+        # Check if game is over after AI's move
+        if self.engine.is_game_over():
+            self.show_game_over()
+        elif PONDER:
+            self.start_pondering()
+
+    def start_pondering(self):
+        # Expect the reply the AI's own search considered best for the player
+        expected = self.engine.ai.hash_move()
+        if expected is not None and expected in self.engine.generate_all_moves():
+            self.ponder_worker = SearchWorker(self.engine, ponder_move=expected).start()
+
+    def move_now(self):
+        if self.search_worker is not None:
+            self.search_worker.move_now()
+
+    def cancel_search(self):
+        if self.search_worker is not None:
+            self.search_worker.cancel()
+
     def show_game_over(self):
         if self.engine.winner == 'draw':
             messagebox.showinfo("Game Over", "Game over. It's a stalemate!")
@@ -104,6 +236,12 @@ class ChessUI:
             messagebox.showinfo("Game Over", message)
 
     def reset_game(self):
+        for worker in (self.search_worker, self.ponder_worker):
+            if worker is not None:
+                worker.cancel()
+        self.search_worker = None
+        self.ponder_worker = None
+        self.engine.ai.close()
         self.engine = ChessEngine()
         self.selected_piece = None
         self.possible_moves = []
@@ -113,3 +251,4 @@ if __name__ == "__main__":
     root = tk.Tk()
     app = ChessUI(root)
     root.mainloop()
+    app.engine.ai.close()
@@ -0,0 +1,237 @@
+# evaluation.py
+
+# Material and piece-square tables for a tapered evaluation. Scores are in centipawns
+# from white's point of view. Tables are laid out like ChessEngine.board for a white
+# piece (first row is rank 8); black pieces use the vertically mirrored square.
+# Pawn structure is scored separately by evaluate_pawns.
+
+MG_VALUES = {'P': 82, 'N': 337, 'B': 365, 'R': 477, 'Q': 1025, 'K': 0}
+EG_VALUES = {'P': 94, 'N': 281, 'B': 297, 'R': 512, 'Q': 936, 'K': 0}
+
+# Game phase: 24 with all minor and major pieces on the board, 0 with only kings and pawns
+PHASE_WEIGHTS = {'P': 0, 'N': 1, 'B': 1, 'R': 2, 'Q': 4, 'K': 0}
+MAX_PHASE = 24
+
+PAWN_MG = [
+      0,   0,   0,   0,   0,   0,   0,   0,
+     50,  50,  50,  50,  50,  50,  50,  50,
+     10,  10,  20,  30,  30,  20,  10,  10,
+      5,   5,  10,  25,  25,  10,   5,   5,
+      0,   0,   0,  20,  20,   0,   0,   0,
+      5,  -5, -10,   0,   0, -10,  -5,   5,
+      5,  10,  10, -20, -20,  10,  10,   5,
+      0,   0,   0,   0,   0,   0,   0,   0,
+]
+PAWN_EG = [
+      0,   0,   0,   0,   0,   0,   0,   0,
+     90,  90,  90,  90,  90,  90,  90,  90,
+     50,  50,  50,  50,  50,  50,  50,  50,
+     30,  30,  30,  30,  30,  30,  30,  30,
+     15,  15,  15,  15,  15,  15,  15,  15,
+      5,   5,   5,   5,   5,   5,   5,   5,
+      0,   0,   0,   0,   0,   0,   0,   0,
+      0,   0,   0,   0,   0,   0,   0,   0,
+]
+KNIGHT_MG = [
+    -50, -40, -30, -30, -30, -30, -40, -50,
+    -40, -20,   0,   0,   0,   0, -20, -40,
+    -30,   0,  10,  15,  15,  10,   0, -30,
+    -30,   5,  15,  20,  20,  15,   5, -30,
+    -30,   0,  15,  20,  20,  15,   0, -30,
+    -30,   5,  10,  15,  15,  10,   5, -30,
+    -40, -20,   0,   5,   5,   0, -20, -40,
+    -50, -40, -30, -30, -30, -30, -40, -50,
+]
+KNIGHT_EG = [
+    -50, -40, -30, -30, -30, -30, -40, -50,
+    -40, -20,   0,   0,   0,   0, -20, -40,
+    -30,   0,  10,  15,  15,  10,   0, -30,
+    -30,   0,  15,  20,  20,  15,   0, -30,
+    -30,   0,  15,  20,  20,  15,   0, -30,
+    -30,   0,  10,  15,  15,  10,   0, -30,
+    -40, -20,   0,   0,   0,   0, -20, -40,
+    -50, -40, -30, -30, -30, -30, -40, -50,
+]
+BISHOP_MG = [
+    -20, -10, -10, -10, -10, -10, -10, -20,
+    -10,   0,   0,   0,   0,   0,   0, -10,
+    -10,   0,   5,  10,  10,   5,   0, -10,
+    -10,   5,   5,  10,  10,   5,   5, -10,
+    -10,   0,  10,  10,  10,  10,   0, -10,
+    -10,  10,  10,  10,  10,  10,  10, -10,
+    -10,   5,   0,   0,   0,   0,   5, -10,
+    -20, -10, -10, -10, -10, -10, -10, -20,
+]
+BISHOP_EG = [
+    -20, -10, -10, -10, -10, -10, -10, -20,
+    -10,   0,   0,   0,   0,   0,   0, -10,
+    -10,   0,   5,  10,  10,   5,   0, -10,
+    -10,   0,  10,  15,  15,  10,   0, -10,
+    -10,   0,  10,  15,  15,  10,   0, -10,
+    -10,   0,   5,  10,  10,   5,   0, -10,
+    -10,   0,   0,   0,   0,   0,   0, -10,
+    -20, -10, -10, -10, -10, -10, -10, -20,
+]
+ROOK_MG = [
+      0,   0,   0,   0,   0,   0,   0,   0,
+      5,  10,  10,  10,  10,  10,  10,   5,
+     -5,   0,   0,   0,   0,   0,   0,  -5,
+     -5,   0,   0,   0,   0,   0,   0,  -5,
+     -5,   0,   0,   0,   0,   0,   0,  -5,
+     -5,   0,   0,   0,   0,   0,   0,  -5,
+     -5,   0,   0,   0,   0,   0,   0,  -5,
+      0,   0,   0,   5,   5,   0,   0,   0,
+]
+ROOK_EG = [
+     10,  10,  10,  10,  10,  10,  10,  10,
+     15,  15,  15,  15,  15,  15,  15,  15,
+      5,   5,   5,   5,   5,   5,   5,   5,
+      0,   0,   0,   0,   0,   0,   0,   0,
+      0,   0,   0,   0,   0,   0,   0,   0,
+      0,   0,   0,   0,   0,   0,   0,   0,
+      0,   0,   0,   0,   0,   0,   0,   0,
+      0,   0,   0,   0,   0,   0,   0,   0,
+]
+QUEEN_MG = [
+    -20, -10, -10,  -5,  -5, -10, -10, -20,
+    -10,   0,   0,   0,   0,   0,   0, -10,
+    -10,   0,   5,   5,   5,   5,   0, -10,
+     -5,   0,   5,   5,   5,   5,   0,  -5,
+      0,   0,   5,   5,   5,   5,   0,  -5,
+    -10,   5,   5,   5,   5,   5,   0, -10,
+    -10,   0,   5,   0,   0,   0,   0, -10,
+    -20, -10, -10,  -5,  -5, -10, -10, -20,
+]
+QUEEN_EG = [
+    -20, -10, -10,  -5,  -5, -10, -10, -20,
+    -10,   0,   5,   5,   5,   5,   0, -10,
+    -10,   5,  10,  10,  10,  10,   5, -10,
+     -5,   5,  10,  15,  15,  10,   5,  -5,
+     -5,   5,  10,  15,  15,  10,   5,  -5,
+    -10,   5,  10,  10,  10,  10,   5, -10,
+    -10,   0,   5,   5,   5,   5,   0, -10,
+    -20, -10, -10,  -5,  -5, -10, -10, -20,
+]
+KING_MG = [
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -20, -30, -30, -40, -40, -30, -30, -20,
+    -10, -20, -20, -20, -20, -20, -20, -10,
+     20,  20,   0,   0,   0,   0,  20,  20,
+     20,  30,  10,   0,   0,  10,  30,  20,
+]
+KING_EG = [
+    -50, -40, -30, -20, -20, -30, -40, -50,
+    -30, -20, -10,   0,   0, -10, -20, -30,
+    -30, -10,  20,  30,  30,  20, -10, -30,
+    -30, -10,  30,  40,  40,  30, -10, -30,
+    -30, -10,  30,  40,  40,  30, -10, -30,
+    -30, -10,  20,  30,  30,  20, -10, -30,
+    -30, -30,   0,   0,   0,   0, -30, -30,
+    -50, -30, -30, -30, -30, -30, -30, -50,
+]
+
+PIECE_SQUARE_TABLES = {
+    'P': (PAWN_MG, PAWN_EG),
+    'N': (KNIGHT_MG, KNIGHT_EG),
+    'B': (BISHOP_MG, BISHOP_EG),
+    'R': (ROOK_MG, ROOK_EG),
+    'Q': (QUEEN_MG, QUEEN_EG),
+    'K': (KING_MG, KING_EG),
+}
+
+
+def build_tables():
+    # Signed material + piece-square value of every piece on every square
+    mg_table = {}
+    eg_table = {}
+    for kind, (mg_pst, eg_pst) in PIECE_SQUARE_TABLES.items():
+        mg_table[kind] = [MG_VALUES[kind] + mg_pst[square] for square in range(64)]
+        eg_table[kind] = [EG_VALUES[kind] + eg_pst[square] for square in range(64)]
+        mirrored = [(7 - square // 8) * 8 + square % 8 for square in range(64)]
+        mg_table[kind.lower()] = [-mg_table[kind][mirrored[square]] for square in range(64)]
+        eg_table[kind.lower()] = [-eg_table[kind][mirrored[square]] for square in range(64)]
+    return mg_table, eg_table
+
+
+MG_TABLE, EG_TABLE = build_tables()
+PHASE = {piece: PHASE_WEIGHTS[piece.upper()] for piece in 'PNBRQKpnbrqk'}
+
+
+def evaluate_position(board):
+    # Returns (midgame score, endgame score, phase) of a board from scratch
+    mg_score = 0
+    eg_score = 0
+    phase = 0
+    for row in range(8):
+        for col in range(8):
+            piece = board[row][col]
+            if piece != ' ':
+                mg_score += MG_TABLE[piece][row * 8 + col]
+                eg_score += EG_TABLE[piece][row * 8 + col]
+                phase += PHASE[piece]
+    return mg_score, eg_score, phase
+
+
+def tapered_score(mg_score, eg_score, phase):
+    # Interpolates between the midgame and endgame scores by the material left on the board
+    phase = min(phase, MAX_PHASE)
+    return (mg_score * phase + eg_score * (MAX_PHASE - phase)) // MAX_PHASE
+
+
+# Pawn structure terms, as (midgame, endgame) for the side owning the pawn
+DOUBLED_PAWN = (-10, -20)  # Per pawn beyond the first on a file
+ISOLATED_PAWN = (-10, -15)  # No friendly pawn on an adjacent file
+BACKWARD_PAWN = (-8, -10)  # Behind its neighbours, with its stop square attacked by an enemy pawn
+# Passed pawn bonus by rank, counted from the owner's back rank
+PASSED_PAWN_MG = [0, 5, 10, 15, 25, 40, 60, 0]
+PASSED_PAWN_EG = [0, 10, 15, 25, 45, 70, 110, 0]
+
+
+def pawn_side_terms(own, enemy):
+    # (midgame, endgame) pawn structure score of the own pawns, given as (row, col) squares
+    # oriented so that they advance towards row 0
+    files = [0] * 8
+    for _, col in own:
+        files[col] += 1
+    mg_score = 0
+    eg_score = 0
+    for count in files:
+        if count > 1:
+            mg_score += DOUBLED_PAWN[0] * (count - 1)
+            eg_score += DOUBLED_PAWN[1] * (count - 1)
+    for row, col in own:
+        isolated = (col == 0 or not files[col - 1]) and (col == 7 or not files[col + 1])
+        passed = (not any(enemy_row < row and abs(enemy_col - col) <= 1 for enemy_row, enemy_col in enemy)
+                  and not any(own_row < row and own_col == col for own_row, own_col in own))
+        if isolated:
+            mg_score += ISOLATED_PAWN[0]
+            eg_score += ISOLATED_PAWN[1]
+        if passed:
+            mg_score += PASSED_PAWN_MG[7 - row]
+            eg_score += PASSED_PAWN_EG[7 - row]
+        elif not isolated:
+            supported = any(own_row >= row and abs(own_col - col) == 1 for own_row, own_col in own)
+            stop_attacked = any(enemy_row == row - 2 and abs(enemy_col - col) == 1 for enemy_row, enemy_col in enemy)
+            if not supported and stop_attacked:
+                mg_score += BACKWARD_PAWN[0]
+                eg_score += BACKWARD_PAWN[1]
+    return mg_score, eg_score
+
+
+def evaluate_pawns(board):
+    # Returns the (midgame, endgame) pawn structure score of a board, from white's point of view.
+    # It depends on the pawns only, so it can be cached by ChessEngine.pawn_hash.
+    white = []
+    black = []
+    for row in range(8):
+        for col in range(8):
+            if board[row][col] == 'P':
+                white.append((row, col))
+            elif board[row][col] == 'p':
+                black.append((7 - row, col))  # Mirrored so black pawns advance towards row 0 too
+    white_mg, white_eg = pawn_side_terms(white, [(7 - row, col) for row, col in black])
+    black_mg, black_eg = pawn_side_terms(black, [(7 - row, col) for row, col in white])
+    return white_mg - black_mg, white_eg - black_eg
@@ -0,0 +1,309 @@
+# match_runner.py
+
+# Headless matches between two ChessAI configurations, to tell whether an engine change
+# makes it stronger or just slower. Every opening is played twice with the colors
+# swapped, games run in parallel on a pool of worker processes, and the result is
+# reported as wins/draws/losses for the first configuration with an Elo estimate, plus
+# the speed and depth each side reached. Games can be saved to a PGN file.
+#
+#   python match_runner.py --games 40 --first "depth=4" --second "depth=4 lmr=off"
+#
+# A configuration is a list of key=value settings: name, depth, movetime (seconds),
+# nodes, hash (MB) and the SEARCH_FEATURES of chess_ai.py set to on or off. Games are
+# adjudicated as draws after --max-plies plies, on threefold repetition and when
+# neither side has enough material left to mate.
+
+import argparse
+import math
+import multiprocessing
+import sys
+import time
+
+from chess_ai import SEARCH_FEATURES
+
+DEFAULT_DEPTH = 3
+DEFAULT_MAX_PLIES = 200
+# Opening lines played from the start position, as UCI moves
+OPENINGS = [
+    "e2e4 e7e5 g1f3 b8c6",
+    "e2e4 c7c5 g1f3 d7d6",
+    "e2e4 e7e6 d2d4 d7d5",
+    "e2e4 c7c6 d2d4 d7d5",
+    "d2d4 d7d5 c2c4 e7e6",
+    "d2d4 g8f6 c2c4 g7g6",
+    "c2c4 e7e5 b1c3 g8f6",
+    "g1f3 d7d5 d2d4 g8f6",
+]
+# Score of a game for white
+RESULT_SCORES = {'1-0': 1.0, '1/2-1/2': 0.5, '0-1': 0.0}
+
+
+def parse_config(text, default_name):
+    # Settings of one side from a string like "name=lmr depth=4 lmr=off"
+    config = {'name': default_name, 'depth': None, 'movetime': None, 'nodes': None, 'hash': 16, 'features': {}}
+    for token in text.split():
+        key, _, value = token.partition('=')
+        if key in SEARCH_FEATURES:
+            if value.lower() not in ('on', 'off'):
+                raise ValueError(f"{key} must be on or off")
+            config['features'][key] = value.lower() == 'on'
+        elif key == 'name':
+            config['name'] = value
+        elif key in ('depth', 'nodes', 'hash'):
+            config[key] = int(value)
+        elif key == 'movetime':
+            config[key] = float(value)
+        else:
+            raise ValueError(f"Unknown setting {key}")
+    if config['depth'] is None and config['movetime'] is None and config['nodes'] is None:
+        config['depth'] = DEFAULT_DEPTH
+    return config
+
+
+def load_openings(path):
+    # Openings of a file with one FEN position per line; text after ';' is a comment
+    openings = []
+    with open(path, encoding='utf-8') as file:
+        for line in file:
+            line = line.split(';', 1)[0].strip()
+            if line:
+                openings.append(('fen', line))
+    return openings
+
+
+def setup_opening(engine, opening):
+    # Sets up an opening given as ('fen', text) or ('moves', text); returns the opening
+    # moves in SAN, which are empty for a FEN opening
+    from chess_engine import START_FEN
+    from pgn import move_to_san
+    kind, text = opening
+    if kind == 'fen':
+        engine.load_fen(text)
+        return []
+    engine.load_fen(START_FEN)
+    san_moves = []
+    for move_str in text.split():
+        move = engine.parse_move_str(move_str)
+        if move not in engine.generate_all_moves():
+            raise ValueError(f"Illegal opening move {move_str}")
+        san_moves.append(move_to_san(engine, move))
+        engine.make_move(move)
+    return san_moves
+
+
+def insufficient_material(engine):
+    # Only kings, or kings and a single minor piece
+    counts = engine.piece_counts
+    others = sum(counts[piece] for piece in 'PNBRQpnbrq')
+    return others == 0 or (others == 1 and counts['N'] + counts['B'] + counts['n'] + counts['b'] == 1)
+
+
+def repetitions(engine):
+    # Times the current position occurred before in the game
+    history = engine.move_history[:engine.history_size]
+    return sum(1 for record in history if record.zobrist_hash == engine.zobrist_hash)
+
+
+def play_game(task):
+    # Plays one game; returns the result with the PGN movetext and per-side search totals
+    from chess_engine import ChessEngine, START_FEN
+    from chess_ai import ChessAI
+    from opening_book import MemoryBook
+    from pgn import move_to_san
+    number, opening, white, black, max_plies = task
+
+    engine = ChessEngine()
+    opening_moves = setup_opening(engine, opening)
+    # The moves of a move opening are kept at the start of the movetext, so the saved
+    # game replays from the standard start position
+    start_fen = START_FEN if opening[0] == 'moves' else engine.to_fen()
+    black_first = start_fen.split()[1] == 'b'
+    players = {}
+    totals = {}
+    for color, config in (('white', white), ('black', black)):
+        ai = ChessAI(engine, tt_size_mb=config['hash'], features=config['features'])
+        ai.opening_book = MemoryBook()  # The opening is set by the match
+        players[color] = ai
+        totals[color] = {'moves': 0, 'nodes': 0, 'seconds': 0.0, 'depth': 0}
+
+    search_args = {color: {'depth': config['depth'], 'movetime': config['movetime'], 'nodes': config['nodes']}
+                   for color, config in (('white', white), ('black', black))}
+    san_moves = list(opening_moves)
+    termination = None
+    while termination is None:
+        if engine.game_over:
+            termination = 'checkmate' if engine.winner != 'draw' else 'stalemate'
+        elif len(san_moves) - len(opening_moves) >= max_plies:
+            termination = 'max plies'
+        elif repetitions(engine) >= 2:
+            termination = 'repetition'
+        elif insufficient_material(engine):
+            termination = 'insufficient material'
+        else:
+            color = engine.current_player
+            ai = players[color]
+            start_time = time.time()
+            move = ai.choose_move(**search_args[color])
+            total = totals[color]
+            total['moves'] += 1
+            total['nodes'] += ai.stats.nodes
+            total['seconds'] += time.time() - start_time
+            total['depth'] += ai.completed_depth
+            san_moves.append(move_to_san(engine, move))
+            engine.make_move(move)
+
+    if termination == 'checkmate':
+        result = '1-0' if engine.winner == 'white' else '0-1'
+    else:
+        result = '1/2-1/2'
+    for ai in players.values():
+        ai.close()
+    return {
+        'number': number,
+        'white': white['name'],
+        'black': black['name'],
+        'fen': start_fen,
+        'black_first': black_first,
+        'moves': san_moves,
+        'result': result,
+        'termination': termination,
+        'totals': totals,
+    }
+
+
+def elo_difference(score):
+    # Elo difference implied by a score fraction
+    if score <= 0.0:
+        return -math.inf
+    if score >= 1.0:
+        return math.inf
+    return 400 * math.log10(score / (1 - score))
+
+
+def elo_estimate(wins, draws, losses):
+    # (Elo difference, 95% error margin) from the first side's point of view
+    games = wins + draws + losses
+    # A score of 0 or 1 means an infinite difference, so scores are kept half a game
+    # away from either end
+    limit = 0.5 / games
+    score = min(max((wins + draws / 2) / games, limit), 1 - limit)
+    variance = (wins * (1 - score) ** 2 + draws * (0.5 - score) ** 2 + losses * score ** 2) / games
+    margin = 1.96 * math.sqrt(variance / games)
+    low = elo_difference(max(score - margin, limit))
+    high = elo_difference(min(score + margin, 1 - limit))
+    return elo_difference(score), (high - low) / 2
+
+
+def game_pgn(game, round_number):
+    from chess_engine import START_FEN
+    from pgn import format_game
+    headers = {
+        'Event': 'Engine match',
+        'Site': '?',
+        'Round': str(round_number),
+        'White': game['white'],
+        'Black': game['black'],
+        'Result': game['result'],
+    }
+    if game['fen'] != START_FEN:
+        headers['SetUp'] = '1'
+        headers['FEN'] = game['fen']
+    headers['PlyCount'] = str(len(game['moves']))
+    headers['Termination'] = game['termination']
+    move_number = int(game['fen'].split()[5])
+    return format_game(headers, game['moves'], game['result'], move_number, game['black_first'])
+
+
+def run_match(first, second, games, openings=None, workers=None, max_plies=DEFAULT_MAX_PLIES):
+    # Yields the finished games in completion order. Game 2k and 2k+1 play the same
+    # opening, with the first configuration as white in the even game.
+    openings = openings or [('moves', line) for line in OPENINGS]
+    tasks = []
+    for number in range(games):
+        opening = openings[(number // 2) % len(openings)]
+        white, black = (first, second) if number % 2 == 0 else (second, first)
+        tasks.append((number, opening, white, black, max_plies))
+    workers = workers or multiprocessing.cpu_count()
+    pool = multiprocessing.Pool(min(workers, games))
+    try:
+        for game in pool.imap_unordered(play_game, tasks):
+            yield game
+    finally:
+        pool.terminate()
+        pool.join()
+
+
+def summarize(games, first, second):
+    # Report lines for a list of finished games
+    wins = draws = losses = 0
+    totals = {first['name']: {'moves': 0, 'nodes': 0, 'seconds': 0.0, 'depth': 0},
+              second['name']: {'moves': 0, 'nodes': 0, 'seconds': 0.0, 'depth': 0}}
+    for game in games:
+        score = RESULT_SCORES[game['result']]
+        if game['black'] == first['name']:
+            score = 1 - score
+        if score == 1:
+            wins += 1
+        elif score == 0:
+            losses += 1
+        else:
+            draws += 1
+        for color in ('white', 'black'):
+            total = totals[game[color]]
+            for key, value in game['totals'][color].items():
+                total[key] += value
+
+    count = len(games)
+    lines = [f"{first['name']} vs {second['name']}: {count} games, "
+             f"+{wins} ={draws} -{losses} ({(wins + draws / 2) / max(count, 1):.1%})"]
+    if count:
+        elo, margin = elo_estimate(wins, draws, losses)
+        lines.append(f"Elo difference: {elo:+.1f} +/- {margin:.1f} (95%)")
+    for name, total in totals.items():
+        moves = max(total['moves'], 1)
+        nps = total['nodes'] / total['seconds'] if total['seconds'] > 0 else 0.0
+        lines.append(f"{name}: {nps:.0f} nps, {total['seconds'] / moves:.3f}s per move, "
+                     f"depth {total['depth'] / moves:.2f}")
+    return lines
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Play a match between two engine configurations")
+    parser.add_argument('--first', default='', help="Settings of the first configuration, e.g. \"depth=4 lmr=off\"")
+    parser.add_argument('--second', default='', help="Settings of the second configuration")
+    parser.add_argument('--games', type=int, default=2 * len(OPENINGS))
+    parser.add_argument('--openings', help="FEN file of opening positions; built-in lines by default")
+    parser.add_argument('--workers', type=int, help="Worker processes; all cores by default")
+    parser.add_argument('--max-plies', type=int, default=DEFAULT_MAX_PLIES, help="Plies before a game is drawn")
+    parser.add_argument('--pgn', help="PGN file to save the games to")
+    args = parser.parse_args(argv)
+
+    try:
+        first = parse_config(args.first, 'first')
+        second = parse_config(args.second, 'second')
+    except ValueError as error:
+        parser.error(str(error))
+    if first['name'] == second['name']:
+        parser.error("The configurations need different names")
+    openings = load_openings(args.openings) if args.openings else None
+
+    start_time = time.time()
+    games = []
+    for game in run_match(first, second, args.games, openings, args.workers, args.max_plies):
+        games.append(game)
+        print(f"Game {game['number'] + 1}: {game['white']} - {game['black']} {game['result']} "
+              f"({game['termination']}, {len(game['moves'])} plies)", file=sys.stderr)
+    games.sort(key=lambda game: game['number'])
+
+    if args.pgn:
+        with open(args.pgn, 'w') as file:
+            for game in games:
+                file.write(game_pgn(game, game['number'] + 1))
+    for line in summarize(games, first, second):
+        print(line)
+    print(f"Played in {time.time() - start_time:.1f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,61 @@
+# move_ordering.py
+
+# Piece values used to rank captures by most valuable victim / least valuable attacker
+ORDER_VALUES = {'P': 1, 'N': 3, 'B': 3, 'R': 5, 'Q': 9, 'K': 100}
+
+# Sort keys of the move classes; quiet moves are ranked by their history score below these
+HASH_MOVE_SCORE = 10000000
+CAPTURE_SCORE = 1000000
+KILLER_SCORES = (900000, 800000)
+
+# Deepest ply killer moves are kept for
+MAX_PLY = 128
+
+
+class MoveOrderer:
+    def __init__(self):
+        self.killers = [[None, None] for _ in range(MAX_PLY)]  # Two quiet cutoff moves per ply
+        self.history = {}  # Quiet move -> accumulated cutoff bonus
+
+    def new_search(self):
+        # Killers are position specific; history is kept but halved so recent cutoffs weigh more
+        for killers in self.killers:
+            killers[0] = None
+            killers[1] = None
+        for move in self.history:
+            self.history[move] //= 2
+
+    def clear(self):
+        self.new_search()
+        self.history = {}
+
+    def score_move(self, board, move, ply, hash_move):
+        if move == hash_move:
+            return HASH_MOVE_SCORE
+        (start_row, start_col), (end_row, end_col) = move
+        victim = board[end_row][end_col]
+        attacker = board[start_row][start_col].upper()
+        if victim != ' ':
+            return CAPTURE_SCORE + ORDER_VALUES[victim.upper()] * 100 - ORDER_VALUES[attacker]
+        if attacker == 'P' and end_row in (0, 7):
+            return CAPTURE_SCORE + ORDER_VALUES['Q'] * 100  # Promotion
+        killers = self.killers[ply]
+        if move == killers[0]:
+            return KILLER_SCORES[0]
+        if move == killers[1]:
+            return KILLER_SCORES[1]
+        return self.history.get(move, 0)
+
+    def order_moves(self, board, moves, ply=0, hash_move=None):
+        # Hash move first, then captures by MVV-LVA, then killers, then quiet moves by history
+        return sorted(moves, key=lambda move: self.score_move(board, move, ply, hash_move), reverse=True)
+
+    def record_cutoff(self, board, move, depth, ply):
+        (end_row, end_col) = move[1]
+        if board[end_row][end_col] != ' ':
+            return  # Captures are already ordered by MVV-LVA
+        killers = self.killers[ply]
+        if killers[0] != move:
+            killers[1] = killers[0]
+            killers[0] = move
+        self.history[move] = self.history.get(move, 0) + depth * depth
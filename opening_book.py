@@ -0,0 +1,215 @@
+# opening_book.py
+
+# Opening books keyed by position hash. On disk a book is a sorted array of 16-byte
+# entries in the Polyglot layout (key, move, weight, learn; big-endian). The keys are
+# the engine's own Zobrist hashes, so Polyglot files made by other tools, which use the
+# Polyglot random key table, cannot be read. The file is memory-mapped and searched
+# with binary search, so opening a book does not read it and lookups are O(log n).
+
+import argparse
+import heapq
+import itertools
+import mmap
+import os
+import random
+import struct
+import sys
+import tempfile
+
+ENTRY = struct.Struct('>QHHI')
+KEY = struct.Struct('>Q')
+MAX_WEIGHT = 0xFFFF
+# Record of the temporary chunk files of an import: key, move, count
+COUNT = struct.Struct('>QHI')
+# Distinct (position, move) pairs an import counts in memory before writing them to a chunk
+CHUNK_ENTRIES = 1000000
+
+# Lines played when no book file is available, as moves from the start position
+BUILTIN_LINES = {
+    "": ["e2e4", "d2d4"],
+    "e2e4": ["e7e5", "c7c5", "e7e6"],
+    "d2d4": ["d7d5", "g8f6", "e7e6"],
+}
+
+
+def encode_move(move):
+    (start_row, start_col), (end_row, end_col) = move
+    return (start_row * 8 + start_col) << 6 | (end_row * 8 + end_col)
+
+
+def decode_move(code):
+    start, end = code >> 6 & 63, code & 63
+    return divmod(start, 8), divmod(end, 8)
+
+
+class OpeningBook:
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, 'rb')
+        size = os.fstat(self.file.fileno()).st_size
+        if size % ENTRY.size:
+            raise ValueError(f"Not a book file: {path}")
+        self.size = size // ENTRY.size
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ) if size else b''
+
+    def lookup(self, key):
+        # Returns [(move, weight), ...] stored for the position hash
+        low, high = 0, self.size
+        while low < high:
+            middle = (low + high) // 2
+            if KEY.unpack_from(self.data, middle * ENTRY.size)[0] < key:
+                low = middle + 1
+            else:
+                high = middle
+        entries = []
+        index = low
+        while index < self.size:
+            entry_key, code, weight, _ = ENTRY.unpack_from(self.data, index * ENTRY.size)
+            if entry_key != key:
+                break
+            entries.append((decode_move(code), weight))
+            index += 1
+        return entries
+
+    def close(self):
+        if self.size:
+            self.data.close()
+        self.file.close()
+
+
+class MemoryBook:
+    # Small in-memory book with the same lookup interface
+    def __init__(self, entries=None):
+        self.entries = entries or {}  # Position hash -> [(move, weight), ...]
+
+    def lookup(self, key):
+        return self.entries.get(key, [])
+
+    def close(self):
+        pass
+
+
+def book_from_lines(lines):
+    # Builds a MemoryBook from {move string sequence: [reply move strings]}
+    from chess_engine import ChessEngine
+    entries = {}
+    engine = ChessEngine()
+    for line, replies in lines.items():
+        for index in range(0, len(line), 4):
+            engine.apply_move(engine.parse_move_str(line[index:index + 4]))
+        entries[engine.zobrist_hash] = [(engine.parse_move_str(reply), 1) for reply in replies]
+        while engine.history_size:
+            engine.undo_move()
+    return MemoryBook(entries)
+
+
+def choose_book_move(book, engine, rng=random):
+    # Picks a legal book move for the engine's position with probability proportional to its weight
+    entries = book.lookup(engine.zobrist_hash)
+    if not entries:
+        return None
+    legal_moves = engine.generate_all_moves()
+    entries = [(move, weight) for move, weight in entries if move in legal_moves and weight > 0]
+    if not entries:
+        return None
+    moves = [move for move, _ in entries]
+    weights = [weight for _, weight in entries]
+    return rng.choices(moves, weights)[0]
+
+
+def iter_pgn_moves(lines, max_plies=20):
+    # Yields (position hash, move code) for each move in the first max_plies of the games
+    from chess_engine import ChessEngine, START_FEN
+    from pgn import iter_games, parse_san
+    engine = ChessEngine()
+    for headers, san_moves, _ in iter_games(lines):
+        try:
+            engine.load_fen(headers.get('FEN', START_FEN))
+        except ValueError:
+            continue
+        for san in san_moves[:max_plies]:
+            try:
+                move = parse_san(engine, san)
+            except ValueError:
+                break  # Unsupported or illegal move; keep the part of the game before it
+            yield engine.zobrist_hash, encode_move(move)
+            engine.apply_move(move)
+
+
+class BookBuilder:
+    # Counts how often each move was played from each position. Up to chunk_entries pairs
+    # are counted in memory; then they are written sorted to a temporary chunk file, and
+    # the chunks are merged when the book is written, so an import of any size takes
+    # about chunk_entries * 200 bytes of memory.
+    def __init__(self, chunk_entries=CHUNK_ENTRIES):
+        self.chunk_entries = chunk_entries
+        self.counts = {}  # (key, move code) -> count
+        self.chunks = []
+
+    def add(self, key, code, count=1):
+        pair = (key, code)
+        self.counts[pair] = self.counts.get(pair, 0) + count
+        if len(self.counts) >= self.chunk_entries:
+            self.flush()
+
+    def flush(self):
+        chunk = tempfile.TemporaryFile()
+        for (key, code), count in sorted(self.counts.items()):
+            chunk.write(COUNT.pack(key, code, count))
+        chunk.seek(0)
+        self.chunks.append(chunk)
+        self.counts = {}
+
+    def merged_counts(self):
+        # Yields (key, move code, count) sorted by key and move, summed over the chunks
+        def read_chunk(chunk):
+            for block in iter(lambda: chunk.read(COUNT.size * 4096), b''):
+                yield from COUNT.iter_unpack(block)
+
+        in_memory = ((key, code, count) for (key, code), count in sorted(self.counts.items()))
+        merged = heapq.merge(in_memory, *[read_chunk(chunk) for chunk in self.chunks])
+        for pair, records in itertools.groupby(merged, key=lambda record: record[:2]):
+            yield pair[0], pair[1], sum(record[2] for record in records)
+
+    def write(self, path, min_count=1):
+        # Writes the sorted book file, most played move first; returns the number of entries
+        written = 0
+        with open(path, 'wb') as file:
+            for key, records in itertools.groupby(self.merged_counts(), key=lambda record: record[0]):
+                entries = sorted((-count, code) for _, code, count in records if count >= min_count)
+                for negative_count, code in entries:
+                    file.write(ENTRY.pack(key, code, min(-negative_count, MAX_WEIGHT), 0))
+                written += len(entries)
+        return written
+
+    def close(self):
+        for chunk in self.chunks:
+            chunk.close()
+        self.chunks = []
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build an opening book from PGN games")
+    parser.add_argument('pgn', nargs='+', help="PGN files to import")
+    parser.add_argument('--output', default='book.bin', help="Book file to write")
+    parser.add_argument('--plies', type=int, default=20, help="Moves per game to import")
+    parser.add_argument('--min-count', type=int, default=1, help="Drop moves played fewer times")
+    parser.add_argument('--chunk-entries', type=int, default=CHUNK_ENTRIES,
+                        help="Position/move pairs counted in memory before spilling to a temporary file")
+    args = parser.parse_args(argv)
+
+    builder = BookBuilder(args.chunk_entries)
+    try:
+        for path in args.pgn:
+            with open(path, encoding='utf-8', errors='replace') as file:
+                for key, code in iter_pgn_moves(file, args.plies):
+                    builder.add(key, code)
+        written = builder.write(args.output, args.min_count)
+    finally:
+        builder.close()
+    print(f"Wrote {written} entries to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
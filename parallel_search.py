@@ -0,0 +1,140 @@
+# parallel_search.py
+
+# Root-parallel search: the root moves of one iteration are spread over a pool of
+# worker processes, each holding its own ChessEngine (and so its own transposition
+# table) for the lifetime of the pool. Workers share the best root score found so
+# far as an alpha bound, so later root moves are searched with a narrower window.
+
+import multiprocessing
+import threading
+
+from search_stats import SearchStats
+from transposition import EXACT
+
+# Per-process state, set up once by init_worker
+worker_engine = None
+shared_bound = None
+shared_stop = None
+
+
+def init_worker(backend, tt_size_mb, features, bound, stop):
+    global worker_engine, shared_bound, shared_stop
+    from chess_engine import ChessEngine
+    from chess_ai import ChessAI
+    worker_engine = ChessEngine(backend)
+    worker_engine.ai = ChessAI(worker_engine, tt_size_mb=tt_size_mb, features=features)
+    worker_engine.ai.shared_stop = stop
+    shared_bound = bound
+    shared_stop = stop
+
+
+def search_root_move(task):
+    # Returns (index, value, exact, counters, reply), the value being for the root player;
+    # value is None if the search was stopped. exact is False when the move failed low
+    # against the shared bound, so its value is only an upper limit. reply is the best
+    # answer to the move found by the search, or None. A task with its own bound is
+    # searched against that bound only and leaves the shared bound alone. counters are
+    # the SearchStats counters of the task.
+    board, current_player, move, depth, index, deadline, fixed_bound = task
+    engine = worker_engine
+    ai = engine.ai
+    engine.set_position(board, current_player)
+    ai.stats = SearchStats()
+    ai.begin_search(deadline)
+
+    # The shared bound is the best score so far from the root player's point of view
+    bound = shared_bound.value if fixed_bound is None else fixed_bound
+    engine.apply_move(move)
+    value = -ai.negamax(depth - 1, float('-inf'), -bound)
+    reply = ai.hash_move()
+    engine.undo_move()
+    if ai.stop_search:
+        return index, None, False, ai.stats.counters(), None
+
+    if fixed_bound is None:
+        with shared_bound.get_lock():
+            if value > shared_bound.value:
+                shared_bound.value = value
+    return index, value, value > bound, ai.stats.counters(), reply
+
+
+class ParallelSearch:
+    def __init__(self, workers=None, backend='mailbox', tt_size_mb=16, features=None):
+        self.workers = workers or multiprocessing.cpu_count()
+        self.shared_bound = multiprocessing.Value('d', float('-inf'))
+        self.shared_stop = multiprocessing.Value('b', 0)
+        # The pool is shared by the AI copies of background searches; a cancelled search may
+        # still be winding down when the next one starts, so searches take turns
+        self.lock = threading.Lock()
+        # Created once and reused for every move so process start-up is paid only once
+        self.pool = multiprocessing.Pool(self.workers, initializer=init_worker,
+                                         initargs=(backend, tt_size_mb, features, self.shared_bound, self.shared_stop))
+
+    def search_root(self, ai, depth, moves):
+        # Searches every root move to depth on the pool. Returns (best_move, best_value) with
+        # the value for the side to move, or None if the search was stopped. Ties go to the
+        # move earliest in moves.
+        with self.lock:
+            return self.search_root_locked(ai, depth, moves)
+
+    def search_root_locked(self, ai, depth, moves):
+        engine = ai.engine
+        board = [row[:] for row in engine.board]
+        tasks = [(board, engine.current_player, move, depth, index, ai.deadline, None)
+                 for index, move in enumerate(moves)]
+        results = self.run(ai, tasks)
+        if results is None:
+            return None
+        best = max((result for result in results if result[2]), key=lambda result: (result[1], -result[0]))
+
+        # A move that failed low against a bound equal to the best value may tie with it,
+        # depending on which moves the workers finished first. Earlier moves like that are
+        # searched again against a fixed bound just below the best value, so ties always go
+        # to the earliest move.
+        index, best_value = best[0], best[1]
+        retry = [tasks[result[0]][:6] + (best_value - 1,) for result in results
+                 if not result[2] and result[0] < index and result[1] >= best_value]
+        if retry:
+            retried = self.run(ai, retry)
+            if retried is not None:
+                ties = [result for result in retried if result[2] and result[1] >= best_value]
+                if ties:
+                    best = min(ties)
+        index, best_value, _, _, reply = best
+        best_move = moves[index]
+
+        # Store the result as ChessAI.search_root does, with the expected reply for pondering
+        ai.transposition_table.store(engine.zobrist_hash, depth, best_value, EXACT, best_move)
+        engine.apply_move(best_move)
+        ai.transposition_table.store(engine.zobrist_hash, depth - 1, -best_value, EXACT, reply)
+        engine.undo_move()
+        return best_move, best_value
+
+    def run(self, ai, tasks):
+        # Results of the tasks in task order, or None if the search was stopped. The counters
+        # of each task are added to the AI's stats as it finishes, so a node limit stops the
+        # remaining tasks once the finished ones have used it up.
+        self.shared_bound.value = float('-inf')
+        self.shared_stop.value = 0
+        pending = self.pool.imap_unordered(search_root_move, tasks, chunksize=1)
+        results = []
+        while len(results) < len(tasks):
+            try:
+                result = pending.next(0.01)
+            except multiprocessing.TimeoutError:
+                result = None
+            if result is not None:
+                results.append(result)
+                ai.stats.add_counters(result[3])
+            ai.check_limits()
+            if ai.stop_search:
+                self.shared_stop.value = 1
+
+        if any(result[1] is None for result in results):
+            return None
+        results.sort(key=lambda result: result[0])
+        return results
+
+    def close(self):
+        self.pool.terminate()
+        self.pool.join()
@@ -0,0 +1,27 @@
+# pawn_hash.py
+
+# Cache of pawn structure scores keyed by ChessEngine.pawn_hash. The pawns rarely change
+# between sibling nodes of the search, so almost every evaluation is a table hit.
+
+# Approximate memory taken by one filled slot: the list pointer plus an entry tuple and its ints
+ENTRY_BYTES = 120
+
+
+class PawnHashTable:
+    def __init__(self, size_mb=2):
+        self.size = max(1, int(size_mb * 1024 * 1024) // ENTRY_BYTES)
+        self.entries = [None] * self.size
+
+    def clear(self):
+        self.entries = [None] * self.size
+
+    def probe(self, key):
+        # Returns (key, midgame score, endgame score) or None
+        entry = self.entries[key % self.size]
+        if entry is not None and entry[0] == key:
+            return entry
+        return None
+
+    def store(self, key, mg_score, eg_score):
+        # Always replaces: a pawn structure is cheap to score again
+        self.entries[key % self.size] = (key, mg_score, eg_score)
@@ -0,0 +1,173 @@
+# perft.py
+
+# Counts the leaf nodes of the legal move tree to a fixed depth. Node counts check the
+# move generator and make/unmake; nodes per second measure their speed.
+#
+# The engine has no castling, en passant or under-promotion, so counts for positions
+# where those rules matter differ from the published perft results; the stored baseline
+# holds this engine's own counts.
+
+import argparse
+import json
+import os
+import sys
+import time
+
+from chess_engine import ChessEngine, BACKENDS
+
+POSITIONS = {
+    'startpos': 'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1',
+    'kiwipete': 'r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1',
+    'endgame': '8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1',
+    'promotions': 'r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1',
+    'middlegame': 'rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8',
+}
+
+# Depth each position is run to by the suite
+SUITE_DEPTHS = {
+    'startpos': 4,
+    'kiwipete': 3,
+    'endgame': 4,
+    'promotions': 3,
+    'middlegame': 3,
+}
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'perft_baseline.json')
+# Allowed drop in nodes per second against the baseline before a run counts as a regression
+DEFAULT_THRESHOLD = 0.25
+
+
+def perft(engine, depth):
+    if depth == 0:
+        return 1
+    moves = engine.generate_all_moves()
+    if depth == 1:
+        return len(moves)
+    nodes = 0
+    for move in moves:
+        engine.apply_move(move)
+        nodes += perft(engine, depth - 1)
+        engine.undo_move()
+    return nodes
+
+
+def divide(engine, depth):
+    # Node counts per root move, in the engine's move string format
+    counts = {}
+    for move in engine.generate_all_moves():
+        engine.apply_move(move)
+        counts[engine.move_to_str(move)] = perft(engine, depth - 1)
+        engine.undo_move()
+    return counts
+
+
+def run_perft(fen, depth, backend='mailbox'):
+    # Returns (nodes, seconds, nodes per second)
+    engine = ChessEngine(backend, move_cache_size=0)  # Measure move generation, not cache hits
+    engine.load_fen(fen)
+    start_time = time.perf_counter()
+    nodes = perft(engine, depth)
+    elapsed = time.perf_counter() - start_time
+    return nodes, elapsed, nodes / elapsed if elapsed > 0 else 0.0
+
+
+def run_suite(backend='mailbox'):
+    results = {}
+    for name, fen in POSITIONS.items():
+        depth = SUITE_DEPTHS[name]
+        nodes, elapsed, nps = run_perft(fen, depth, backend)
+        results[name] = {'depth': depth, 'nodes': nodes, 'seconds': round(elapsed, 3), 'nps': round(nps)}
+        print(f"{name:<12} depth {depth}  nodes {nodes:>9}  time {elapsed:7.2f}s  nps {nps:>9.0f}")
+    return results
+
+
+def load_baseline(path=BASELINE_FILE):
+    with open(path) as file:
+        return json.load(file)
+
+
+def save_baseline(results, backend, path=BASELINE_FILE):
+    baseline = load_baseline(path) if os.path.exists(path) else {'threshold': DEFAULT_THRESHOLD}
+    baseline[backend] = {name: {'depth': result['depth'], 'nodes': result['nodes'], 'nps': result['nps']}
+                         for name, result in results.items()}
+    with open(path, 'w') as file:
+        json.dump(baseline, file, indent=2)
+        file.write('\n')
+
+
+def compare_with_baseline(results, backend, path=BASELINE_FILE, threshold=None):
+    # Returns a list of problems; node count mismatches are correctness bugs,
+    # speed drops beyond the threshold are performance regressions
+    baseline = load_baseline(path)
+    if threshold is None:
+        threshold = baseline.get('threshold', DEFAULT_THRESHOLD)
+    expected = baseline.get(backend, {})
+    problems = []
+    for name, result in results.items():
+        if name not in expected:
+            problems.append(f"{name}: no baseline for backend {backend}")
+            continue
+        reference = expected[name]
+        if reference['depth'] != result['depth']:
+            problems.append(f"{name}: baseline is for depth {reference['depth']}, ran depth {result['depth']}")
+            continue
+        if reference['nodes'] != result['nodes']:
+            problems.append(f"{name}: {result['nodes']} nodes, expected {reference['nodes']}")
+        if result['nps'] < reference['nps'] * (1 - threshold):
+            problems.append(f"{name}: {result['nps']} nps is more than {threshold:.0%} "
+                            f"below the baseline {reference['nps']}")
+    return problems
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Perft benchmark for the chess engine")
+    parser.add_argument('--position', choices=sorted(POSITIONS), help="Run a single named position")
+    parser.add_argument('--fen', help="Run a single position given as FEN")
+    parser.add_argument('--depth', type=int, help="Depth for --position/--fen")
+    parser.add_argument('--divide', action='store_true', help="Print node counts per root move")
+    parser.add_argument('--backend', choices=BACKENDS, default='mailbox')
+    parser.add_argument('--check', action='store_true', help="Compare the suite with the baseline file")
+    parser.add_argument('--save', action='store_true', help="Store the suite results as the baseline")
+    parser.add_argument('--threshold', type=float, help="Allowed nps drop for --check, e.g. 0.25")
+    parser.add_argument('--baseline', default=BASELINE_FILE, help="Baseline file")
+    args = parser.parse_args(argv)
+
+    if args.position or args.fen:
+        fen = args.fen or POSITIONS[args.position]
+        depth = args.depth or SUITE_DEPTHS.get(args.position, 3)
+        if args.divide:
+            engine = ChessEngine(args.backend, move_cache_size=0)
+            engine.load_fen(fen)
+            start_time = time.perf_counter()
+            counts = divide(engine, depth)
+            elapsed = time.perf_counter() - start_time
+            for move_str in sorted(counts):
+                print(f"{move_str}: {counts[move_str]}")
+            nodes = sum(counts.values())
+        else:
+            nodes, elapsed, _ = run_perft(fen, depth, args.backend)
+        nps = nodes / elapsed if elapsed > 0 else 0.0
+        print(f"depth {depth}  nodes {nodes}  time {elapsed:.2f}s  nps {nps:.0f}")
+        return 0
+
+    results = run_suite(args.backend)
+    total_nodes = sum(result['nodes'] for result in results.values())
+    total_seconds = sum(result['seconds'] for result in results.values())
+    if total_seconds > 0:
+        print(f"total        nodes {total_nodes}  time {total_seconds:.2f}s  nps {total_nodes / total_seconds:.0f}")
+
+    if args.save:
+        save_baseline(results, args.backend, args.baseline)
+        print(f"Baseline written to {args.baseline}")
+    if args.check:
+        problems = compare_with_baseline(results, args.backend, args.baseline, args.threshold)
+        for problem in problems:
+            print(f"REGRESSION {problem}")
+        if problems:
+            return 1
+        print("No regressions against the baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
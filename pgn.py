@@ -0,0 +1,167 @@
+# pgn.py
+
+# Minimal PGN reading and writing: games are streamed one at a time from any iterable of lines,
+# and SAN moves are resolved against the engine's legal moves.
+
+import re
+
+SAN_PATTERN = re.compile(r'^([NBRQK])?([a-h])?([1-8])?x?([a-h][1-8])(?:=?([NBRQ]))?[+#]?[!?]*$')
+RESULTS = ('1-0', '0-1', '1/2-1/2', '*')
+HEADER_PATTERN = re.compile(r'^\[(\w+)\s+"(.*)"\]\s*$')
+
+
+def tokenize_movetext(text):
+    # Splits movetext into SAN moves and results, dropping comments, variations,
+    # NAGs and move numbers
+    tokens = []
+    depth = 0
+    index = 0
+    while index < len(text):
+        char = text[index]
+        if char == '{':
+            end = text.find('}', index)
+            index = len(text) if end == -1 else end + 1
+            continue
+        if char == ';':
+            end = text.find('\n', index)
+            index = len(text) if end == -1 else end + 1
+            continue
+        if char == '(':
+            depth += 1
+        elif char == ')':
+            depth -= 1
+        elif not char.isspace():
+            end = index
+            while end < len(text) and not text[end].isspace() and text[end] not in '{;()':
+                end += 1
+            token = text[index:end]
+            index = end
+            if depth == 0 and not token.startswith('$'):
+                token = re.sub(r'^\d+\.+', '', token)
+                if token:
+                    tokens.append(token)
+            continue
+        index += 1
+    return tokens
+
+
+def iter_games(lines):
+    # Yields (headers, san_moves, result) for every game of a PGN stream
+    headers = {}
+    movetext = []
+    for line in lines:
+        stripped = line.strip()
+        header = HEADER_PATTERN.match(stripped)
+        if header:
+            if movetext:
+                yield finish_game(headers, movetext)
+                headers = {}
+                movetext = []
+            headers[header.group(1)] = header.group(2)
+            continue
+        if stripped:
+            movetext.append(line)
+            if stripped.split()[-1] in RESULTS:
+                yield finish_game(headers, movetext)
+                headers = {}
+                movetext = []
+    if movetext:
+        yield finish_game(headers, movetext)
+
+
+def finish_game(headers, movetext):
+    moves = []
+    result = headers.get('Result', '*')
+    for token in tokenize_movetext(''.join(movetext)):
+        if token in RESULTS:
+            result = token
+        else:
+            moves.append(token)
+    return headers, moves, result
+
+
+def parse_san(engine, san):
+    # Returns the engine move for a SAN string in the current position
+    if san.startswith('O-O') or san.startswith('0-0'):
+        raise ValueError(f"Castling is not supported: {san}")
+    match = SAN_PATTERN.match(san)
+    if not match:
+        raise ValueError(f"Invalid SAN move: {san}")
+    kind, from_file, from_rank, destination, promotion = match.groups()
+    kind = kind or 'P'
+    if promotion is not None and promotion != 'Q':
+        raise ValueError(f"Under-promotion is not supported: {san}")
+    end = (8 - int(destination[1]), ord(destination[0]) - ord('a'))
+
+    candidates = []
+    for move in engine.generate_all_moves():
+        start, move_end = move
+        if move_end != end or engine.board[start[0]][start[1]].upper() != kind:
+            continue
+        if from_file is not None and start[1] != ord(from_file) - ord('a'):
+            continue
+        if from_rank is not None and start[0] != 8 - int(from_rank):
+            continue
+        candidates.append(move)
+    if len(candidates) != 1:
+        raise ValueError(f"{'Ambiguous' if candidates else 'Illegal'} SAN move: {san}")
+    return candidates[0]
+
+
+def move_to_san(engine, move):
+    # SAN string of a legal move in the current position
+    (start_row, start_col), (end_row, end_col) = move
+    board = engine.board
+    piece = board[start_row][start_col]
+    kind = piece.upper()
+    capture = board[end_row][end_col] != ' '
+    destination = chr(ord('a') + end_col) + str(8 - end_row)
+
+    if kind == 'P':
+        san = (chr(ord('a') + start_col) + 'x' if capture else '') + destination
+        if end_row in (0, 7):
+            san += '=Q'
+    else:
+        # Add the file, the rank or both when another piece of the same kind can go there too
+        others = [start for start, end in engine.generate_all_moves()
+                  if end == move[1] and start != move[0] and board[start[0]][start[1]] == piece]
+        qualifier = ''
+        if others:
+            if all(start[1] != start_col for start in others):
+                qualifier = chr(ord('a') + start_col)
+            elif all(start[0] != start_row for start in others):
+                qualifier = str(8 - start_row)
+            else:
+                qualifier = chr(ord('a') + start_col) + str(8 - start_row)
+        san = kind + qualifier + ('x' if capture else '') + destination
+
+    engine.apply_move(move)
+    if engine.is_in_check(engine.current_player):
+        san += '#' if not engine.has_legal_moves(engine.current_player) else '+'
+    engine.undo_move()
+    return san
+
+
+def format_game(headers, san_moves, result, move_number=1, black_first=False):
+    # PGN text of a game: the headers in the given order, then the movetext wrapped at 80
+    # columns. move_number and black_first describe the position the moves start from.
+    lines = [f'[{name} "{value}"]' for name, value in headers.items()]
+    lines.append('')
+    tokens = []
+    for index, san in enumerate(san_moves):
+        ply = index + (1 if black_first else 0)
+        if ply % 2 == 0:
+            tokens.append(f"{move_number + ply // 2}.")
+        elif index == 0:
+            tokens.append(f"{move_number + ply // 2}...")
+        tokens.append(san)
+    tokens.append(result)
+    line = ''
+    for token in tokens:
+        if line and len(line) + 1 + len(token) > 80:
+            lines.append(line)
+            line = token
+        else:
+            line = f"{line} {token}" if line else token
+    lines.append(line)
+    return '\n'.join(lines) + '\n\n'
@@ -0,0 +1,124 @@
+# search_stats.py
+
+import json
+import time
+
+# Counters summed over the worker processes of a parallel search
+COUNTERS = (
+    'nodes', 'leaf_evaluations', 'beta_cutoffs', 'first_move_cutoffs', 'tt_probes', 'tt_hits',
+    'tt_cutoffs', 'tablebase_hits', 'null_move_cutoffs', 'reductions', 're_searches',
+    'aspiration_researches', 'pawn_hash_hits', 'pawn_hash_misses', 'movegen_seconds', 'eval_seconds',
+)
+
+
+class SearchStats:
+    # Counters and timings of one choose_move call
+    def __init__(self):
+        self.nodes = 0  # Positions visited below the root
+        self.leaf_evaluations = 0
+        self.beta_cutoffs = 0
+        self.first_move_cutoffs = 0  # Cutoffs caused by the first move searched
+        self.tt_probes = 0
+        self.tt_hits = 0
+        self.tt_cutoffs = 0
+        self.tablebase_hits = 0  # Subtrees cut off by an endgame bitbase result
+        self.null_move_cutoffs = 0
+        self.reductions = 0  # Late moves searched with reduced depth
+        self.re_searches = 0  # Zero-window or reduced searches repeated with the full window or depth
+        self.aspiration_researches = 0  # Root searches repeated after failing outside the aspiration window
+        self.pawn_hash_hits = 0  # Evaluations whose pawn structure score was cached
+        self.pawn_hash_misses = 0
+        self.movegen_seconds = 0.0
+        self.eval_seconds = 0.0
+        self.iterations = []  # One dict per completed depth
+        self.depth = 0
+        self.score = None
+        self.best_move = None
+        self.book_move = False
+        self.stopped = False  # An iteration was interrupted by the budget or stop()
+        self.start_time = time.time()
+        self.elapsed = 0.0
+        self.iteration_start = self.start_time
+        self.iteration_nodes = 0
+
+    def start_iteration(self):
+        self.iteration_start = time.time()
+        self.iteration_nodes = self.nodes
+
+    def finish_iteration(self, depth, score, best_move):
+        self.iterations.append({
+            'depth': depth,
+            'seconds': round(time.time() - self.iteration_start, 6),
+            'nodes': self.nodes - self.iteration_nodes,
+            'score': score,
+            'best_move': best_move,
+        })
+        self.depth = depth
+        self.score = score
+        self.best_move = best_move
+
+    def finish(self):
+        self.elapsed = time.time() - self.start_time
+
+    def counters(self):
+        return {name: getattr(self, name) for name in COUNTERS}
+
+    def add_counters(self, counters):
+        # Adds the counters of a search done elsewhere, e.g. by a worker process
+        for name, value in counters.items():
+            setattr(self, name, getattr(self, name) + value)
+
+    @property
+    def first_move_cutoff_rate(self):
+        # Share of beta cutoffs produced by the first move; close to 1 means good move ordering
+        if not self.beta_cutoffs:
+            return 0.0
+        return self.first_move_cutoffs / self.beta_cutoffs
+
+    @property
+    def effective_branching_factor(self):
+        # Growth in nodes between the last two iterations, or the depth-th root of the nodes
+        if len(self.iterations) >= 2 and self.iterations[-2]['nodes']:
+            return self.iterations[-1]['nodes'] / self.iterations[-2]['nodes']
+        if self.iterations and self.nodes:
+            return self.nodes ** (1 / self.iterations[-1]['depth'])
+        return 0.0
+
+    @property
+    def nps(self):
+        return self.nodes / self.elapsed if self.elapsed > 0 else 0.0
+
+    def to_dict(self):
+        return {
+            'nodes': self.nodes,
+            'leaf_evaluations': self.leaf_evaluations,
+            'beta_cutoffs': self.beta_cutoffs,
+            'first_move_cutoffs': self.first_move_cutoffs,
+            'first_move_cutoff_rate': round(self.first_move_cutoff_rate, 4),
+            'effective_branching_factor': round(self.effective_branching_factor, 3),
+            'tt_probes': self.tt_probes,
+            'tt_hits': self.tt_hits,
+            'tt_cutoffs': self.tt_cutoffs,
+            'tablebase_hits': self.tablebase_hits,
+            'null_move_cutoffs': self.null_move_cutoffs,
+            'reductions': self.reductions,
+            're_searches': self.re_searches,
+            'aspiration_researches': self.aspiration_researches,
+            'pawn_hash_hits': self.pawn_hash_hits,
+            'pawn_hash_misses': self.pawn_hash_misses,
+            'movegen_seconds': round(self.movegen_seconds, 6),
+            'eval_seconds': round(self.eval_seconds, 6),
+            'elapsed': round(self.elapsed, 6),
+            'nps': round(self.nps),
+            'depth': self.depth,
+            'score': self.score,
+            'best_move': self.best_move,
+            'book_move': self.book_move,
+            'stopped': self.stopped,
+            'iterations': self.iterations,
+        }
+
+    def write_json_line(self, path):
+        # Appends the stats as one JSON object per line
+        with open(path, 'a') as file:
+            file.write(json.dumps(self.to_dict()) + '\n')
@@ -0,0 +1,60 @@
+# search_worker.py
+
+import threading
+import time
+
+from chess_ai import MAX_SEARCH_DEPTH
+
+
+class SearchWorker:
+    # Runs ChessAI.choose_move in a background thread on a snapshot of the position,
+    # so the caller's event loop keeps running and the live engine is left untouched
+    def __init__(self, engine, ponder_move=None, **search_args):
+        self.engine = engine.copy()
+        self.search_args = search_args  # Passed on to choose_move (movetime, depth, ...)
+        # When pondering, the expected reply is played on the snapshot and searched with
+        # no budget until ponderhit() or cancel()
+        self.ponder_move = ponder_move
+        if ponder_move is not None:
+            self.engine.make_move(ponder_move)
+        self.move = None
+        self.done = False
+        self.cancelled = False
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def run(self):
+        if self.ponder_move is not None:
+            self.move = self.engine.ai.choose_move(depth=MAX_SEARCH_DEPTH)
+        else:
+            self.move = self.engine.ai.choose_move(**self.search_args)
+        self.done = True
+
+    def progress(self):
+        # (completed depth, nodes searched) of the running search
+        ai = self.engine.ai
+        return ai.completed_depth, ai.stats.nodes
+
+    def wait_until_searching(self):
+        # Limits set before the search starts would be reset by it
+        while not self.engine.ai.searching and not self.done:
+            time.sleep(0.001)
+
+    def ponderhit(self, **search_args):
+        # The expected move was played: finish the search with a normal budget
+        self.wait_until_searching()
+        self.engine.ai.ponderhit(**search_args)
+
+    def move_now(self):
+        # Stops the search; the best move of the last completed iteration is kept
+        self.wait_until_searching()
+        self.engine.ai.stop()
+
+    def cancel(self):
+        # Stops the search and marks its result as unwanted
+        self.cancelled = True
+        self.wait_until_searching()
+        self.engine.ai.stop()
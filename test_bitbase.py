@@ -0,0 +1,61 @@
+# test_bitbase.py
+
+# Generates the KRK table into a temporary directory and checks that the engine, guided
+# by the table, converts won rook endings into mate at the distance the table gives.
+#
+#   python -m unittest test_bitbase
+
+import shutil
+import tempfile
+import unittest
+
+from bitbase import generate_table, WIN
+from chess_engine import ChessEngine
+from chess_ai import ChessAI
+from opening_book import MemoryBook
+
+# Won KRK positions, with the rook on either side
+POSITIONS = [
+    '1R6/5K2/8/7k/8/8/8/8 w - - 0 1',
+    '6r1/8/8/7k/8/8/8/3K4 b - - 0 1',
+    '8/8/8/7k/8/8/r7/4K3 b - - 0 1',
+    '8/8/3k4/8/8/8/8/R3K3 w - - 0 1',
+]
+
+
+class KRKConversionTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.mkdtemp()
+        generate_table('KRK', cls.directory)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.directory)
+
+    def test_mate_in_one(self):
+        engine = ChessEngine()
+        engine.load_fen('7k/8/6K1/8/8/8/8/R7 w - - 0 1')
+        ai = ChessAI(engine, tablebase_dir=self.directory)
+        self.assertEqual(ai.tablebase.probe(engine), (WIN, 1))
+
+    def test_converts_to_mate(self):
+        for fen in POSITIONS:
+            with self.subTest(fen=fen):
+                engine = ChessEngine()
+                engine.load_fen(fen)
+                ai = ChessAI(engine, max_depth=2, tablebase_dir=self.directory)
+                ai.opening_book = MemoryBook()
+                result, plies = ai.tablebase.probe(engine)
+                self.assertEqual(result, WIN)
+                played = 0
+                while not engine.game_over and played < 100:
+                    engine.make_move(ai.choose_move())
+                    played += 1
+                self.assertEqual(engine.winner, 'white' if fen.split()[1] == 'w' else 'black')
+                # Both sides follow the table, so the mate comes exactly when it says
+                self.assertEqual(played, plies)
+
+
+if __name__ == '__main__':
+    unittest.main()
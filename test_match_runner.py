@@ -0,0 +1,41 @@
+# test_match_runner.py
+#
+#   python -m unittest test_match_runner
+
+import math
+import unittest
+
+from chess_engine import ChessEngine, START_FEN
+from match_runner import elo_estimate, game_pgn, parse_config, play_game
+from pgn import iter_games, parse_san
+
+
+class EloEstimateTest(unittest.TestCase):
+    def test_even_score(self):
+        self.assertEqual(elo_estimate(3, 4, 3)[0], 0.0)
+
+    def test_perfect_score_is_finite(self):
+        for results, sign in (((4, 0, 0), 1), ((0, 0, 4), -1)):
+            elo, margin = elo_estimate(*results)
+            self.assertTrue(math.isfinite(elo) and math.isfinite(margin), results)
+            self.assertGreater(sign * elo, 0, results)
+
+
+class GamePgnTest(unittest.TestCase):
+    def test_move_opening_is_saved_from_the_start_position(self):
+        config = parse_config('depth=1', 'first')
+        game = play_game((0, ('moves', 'e2e4 e7e5 g1f3'), config, dict(config, name='second'), 2))
+        self.assertEqual(game['moves'][:3], ['e4', 'e5', 'Nf3'])
+        self.assertEqual(len(game['moves']), 5)
+
+        headers, san_moves, _ = next(iter_games(game_pgn(game, 1).splitlines(True)))
+        self.assertNotIn('FEN', headers)
+        self.assertEqual(san_moves, game['moves'])
+        engine = ChessEngine()
+        engine.load_fen(START_FEN)
+        for san in san_moves:
+            engine.make_move(parse_san(engine, san))
+
+
+if __name__ == '__main__':
+    unittest.main()
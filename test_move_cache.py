@@ -0,0 +1,42 @@
+# test_move_cache.py
+
+# Checks that the legal move cache returns the same moves as an engine without it,
+# along random games with moves taken back.
+#
+#   python -m unittest test_move_cache
+
+import random
+import unittest
+
+from chess_engine import ChessEngine, BACKENDS
+
+
+class MoveCacheTest(unittest.TestCase):
+    def test_same_moves_as_uncached(self):
+        for backend in BACKENDS:
+            with self.subTest(backend=backend):
+                rng = random.Random(7)
+                cached = ChessEngine(backend, move_cache_size=64)
+                uncached = ChessEngine(backend, move_cache_size=0)
+                for _ in range(300):
+                    moves = cached.generate_all_moves()
+                    self.assertEqual(moves, uncached.generate_all_moves())
+                    self.assertEqual((cached.game_over, cached.winner), (uncached.game_over, uncached.winner))
+                    self.assertEqual(cached.is_in_checkmate(cached.current_player),
+                                     uncached.is_in_checkmate(uncached.current_player))
+                    if not moves or cached.history_size > 60 or rng.random() < 0.2:
+                        # Taking moves back revisits cached positions
+                        for engine in (cached, uncached):
+                            if engine.history_size:
+                                engine.undo_move()
+                        continue
+                    move = rng.choice(moves)
+                    cached.make_move(move)
+                    uncached.make_move(move)
+                self.assertGreater(cached.move_cache_hits, 0)
+                self.assertEqual(uncached.move_cache_hits, 0)
+                self.assertLessEqual(len(cached.move_cache), 64)
+
+
+if __name__ == '__main__':
+    unittest.main()
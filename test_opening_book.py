@@ -0,0 +1,70 @@
+# test_opening_book.py
+
+# Checks that a PGN import spilled to chunk files writes the same book as one counted
+# in memory, and that the book is read back by position hash.
+#
+#   python -m unittest test_opening_book
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from chess_engine import ChessEngine
+from opening_book import BookBuilder, OpeningBook, iter_pgn_moves
+
+GAMES = """[Event "1"]
+
+1. e4 e5 2. Nf3 Nc6 3. Bb5 a6 1-0
+
+[Event "2"]
+
+1. e4 c5 2. Nf3 d6 3. d4 cxd4 0-1
+
+[Event "3"]
+
+1. d4 d5 2. c4 e6 3. Nc3 Nf6 1/2-1/2
+
+[Event "4"]
+
+1. e4 e5 2. Nf3 Nf6 3. Nxe5 d6 1/2-1/2
+"""
+
+
+class BookBuilderTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def build(self, chunk_entries):
+        path = os.path.join(self.directory, f'book{chunk_entries}.bin')
+        builder = BookBuilder(chunk_entries)
+        try:
+            for key, code in iter_pgn_moves(GAMES.splitlines(True)):
+                builder.add(key, code)
+            written = builder.write(path)
+            self.assertEqual(bool(builder.chunks), chunk_entries < written)
+        finally:
+            builder.close()
+        with open(path, 'rb') as file:
+            return written, file.read(), path
+
+    def test_chunked_import_matches_in_memory(self):
+        written, data, _ = self.build(10 ** 6)
+        self.assertEqual(self.build(3)[:2], (written, data))
+
+    def test_lookup(self):
+        _, _, path = self.build(3)
+        book = OpeningBook(path)
+        try:
+            entries = book.lookup(ChessEngine().zobrist_hash)
+        finally:
+            book.close()
+        engine = ChessEngine()
+        self.assertEqual(entries, [(engine.parse_move_str('e2e4'), 3), (engine.parse_move_str('d2d4'), 1)])
+
+
+if __name__ == '__main__':
+    unittest.main()
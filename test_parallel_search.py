@@ -0,0 +1,38 @@
+# test_parallel_search.py
+
+# Checks that a root-parallel search reports the counters of its worker processes and
+# stops at a node limit.
+#
+#   python -m unittest test_parallel_search
+
+import unittest
+
+from chess_engine import ChessEngine
+from chess_ai import ChessAI
+from opening_book import MemoryBook
+
+
+class ParallelSearchTest(unittest.TestCase):
+    def setUp(self):
+        self.engine = ChessEngine()
+        self.ai = ChessAI(self.engine, max_depth=3, workers=2)
+        self.ai.opening_book = MemoryBook()
+
+    def tearDown(self):
+        self.ai.close()
+
+    def test_worker_counters(self):
+        self.ai.choose_move()
+        stats = self.ai.stats
+        for name in ('nodes', 'leaf_evaluations', 'beta_cutoffs', 'tt_probes', 'movegen_seconds', 'eval_seconds'):
+            self.assertGreater(getattr(stats, name), 0, name)
+
+    def test_node_limit(self):
+        self.ai.choose_move(nodes=2000)
+        self.assertTrue(self.ai.stats.stopped)
+        # Tasks already running when the limit is reached still finish their move
+        self.assertLess(self.ai.stats.nodes, 20000)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,49 @@
+# test_pawn_hash.py
+
+# Checks that pawn structure scores served from the pawn hash table equal a fresh
+# computation, and that the incrementally updated pawn hash matches a recomputed one.
+#
+#   python -m unittest test_pawn_hash
+
+import random
+import unittest
+
+from chess_engine import ChessEngine, START_FEN
+from chess_ai import ChessAI
+from evaluation import evaluate_pawns, evaluate_position, tapered_score
+from pawn_hash import PawnHashTable
+from zobrist import compute_pawn_hash
+
+
+class PawnHashTest(unittest.TestCase):
+    def test_hit_equals_fresh_computation(self):
+        rng = random.Random(11)
+        engine = ChessEngine()
+        ai = ChessAI(engine)
+        for _ in range(200):
+            moves = engine.generate_all_moves()
+            if not moves or engine.history_size > 80:
+                engine.load_fen(START_FEN)
+                continue
+            engine.make_move(rng.choice(moves))
+            self.assertEqual(engine.pawn_hash, compute_pawn_hash(engine.board))
+
+            score = ai.evaluate_board()
+            self.assertEqual(ai.pawn_table.probe(engine.pawn_hash)[1:], evaluate_pawns(engine.board))
+            hits = ai.stats.pawn_hash_hits
+            self.assertEqual(ai.evaluate_board(), score)
+            self.assertEqual(ai.stats.pawn_hash_hits, hits + 1)
+            # The same score from scratch, with black-positive sign as evaluate_board
+            mg_score, eg_score, phase = evaluate_position(engine.board)
+            pawn_mg, pawn_eg = evaluate_pawns(engine.board)
+            self.assertEqual(score, -tapered_score(mg_score + pawn_mg, eg_score + pawn_eg, phase))
+
+    def test_collisions_are_rejected(self):
+        table = PawnHashTable(size_mb=0.001)
+        table.store(5, 10, 20)
+        self.assertEqual(table.probe(5), (5, 10, 20))
+        self.assertIsNone(table.probe(5 + table.size))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,50 @@
+# test_search.py
+
+# Checks that the search finds known mates in two with the pruning and reduction
+# techniques of SEARCH_FEATURES switched on, and with all of them off.
+#
+#   python -m unittest test_search
+
+import unittest
+
+from chess_engine import ChessEngine
+from chess_ai import ChessAI, MATE_SCORE, SEARCH_FEATURES
+from opening_book import MemoryBook
+
+# Positions with a mate in two for the side to move, and the first move when it is the only one
+MATES_IN_TWO = [
+    ('r1b2k1r/ppp1bppp/8/1B1Q4/5q2/2P5/PPP2PPP/R3R1K1 w - - 0 1', 'd5d8'),  # Queen sacrifice
+    ('r3r1k1/ppp2ppp/2p5/5Q2/1b1q4/8/PPP1BPPP/R1B2K1R b - - 0 1', 'd4d1'),  # The same, colors reversed
+    ('7k/8/8/8/8/8/R7/1R4K1 w - - 0 1', None),  # Rook ladder
+    ('1r4k1/r7/8/8/8/8/8/7K b - - 0 1', None),
+]
+
+
+class MateSearchTest(unittest.TestCase):
+    def play_mate(self, fen, first_move, features):
+        engine = ChessEngine()
+        engine.load_fen(fen)
+        winner = 'white' if fen.split()[1] == 'w' else 'black'
+        ai = ChessAI(engine, features=features)
+        ai.opening_book = MemoryBook()
+        move = ai.choose_move(depth=4)
+        if first_move is not None:
+            self.assertEqual(engine.move_to_str(move), first_move)
+        # best_score is positive when black is better
+        self.assertGreaterEqual(ai.best_score if winner == 'black' else -ai.best_score, MATE_SCORE)
+        engine.make_move(move)
+        for _ in range(2):
+            engine.make_move(ai.choose_move(depth=4))
+        self.assertTrue(engine.game_over)
+        self.assertEqual(engine.winner, winner)
+
+    def test_mate_in_two(self):
+        for name, features in (('all on', dict(SEARCH_FEATURES)),
+                               ('all off', {feature: False for feature in SEARCH_FEATURES})):
+            for fen, first_move in MATES_IN_TWO:
+                with self.subTest(features=name, fen=fen):
+                    self.play_mate(fen, first_move, features)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+# test_search_stats.py
+
+# Checks the search telemetry of a fixed-depth search and the JSON lines log.
+#
+#   python -m unittest test_search_stats
+
+import json
+import os
+import tempfile
+import unittest
+
+from chess_engine import ChessEngine
+from chess_ai import ChessAI
+from opening_book import MemoryBook
+from search_stats import COUNTERS
+
+
+class SearchStatsTest(unittest.TestCase):
+    def setUp(self):
+        handle, self.log_path = tempfile.mkstemp(suffix='.jsonl')
+        os.close(handle)
+        self.engine = ChessEngine()
+        self.engine.load_fen('r1bqkbnr/pppp1ppp/2n5/4p3/4P3/5N2/PPPP1PPP/RNBQKB1R w KQkq - 2 3')
+        self.ai = ChessAI(self.engine, stats_log=self.log_path)
+        self.ai.opening_book = MemoryBook()
+
+    def tearDown(self):
+        self.ai.close()
+        os.remove(self.log_path)
+
+    def test_counters(self):
+        self.ai.choose_move(depth=3)
+        stats = self.ai.stats
+        self.assertGreater(stats.nodes, 0)
+        self.assertGreater(stats.leaf_evaluations, 0)
+        self.assertLessEqual(stats.leaf_evaluations, stats.nodes)
+        self.assertGreater(stats.beta_cutoffs, 0)
+        self.assertLessEqual(stats.first_move_cutoffs, stats.beta_cutoffs)
+        self.assertLessEqual(stats.tt_cutoffs, stats.tt_hits)
+        self.assertLessEqual(stats.tt_hits, stats.tt_probes)
+        self.assertEqual(stats.pawn_hash_hits + stats.pawn_hash_misses, stats.leaf_evaluations)
+        self.assertGreater(stats.movegen_seconds, 0)
+        self.assertGreater(stats.eval_seconds, 0)
+
+    def test_iterations(self):
+        self.ai.choose_move(depth=3)
+        stats = self.ai.stats
+        self.assertEqual([iteration['depth'] for iteration in stats.iterations], [1, 2, 3])
+        self.assertEqual(sum(iteration['nodes'] for iteration in stats.iterations), stats.nodes)
+        self.assertEqual(stats.depth, 3)
+        self.assertFalse(stats.stopped)
+
+    def test_json_log(self):
+        self.ai.choose_move(depth=2)
+        self.ai.choose_move(depth=1)
+        with open(self.log_path) as file:
+            records = [json.loads(line) for line in file]
+        self.assertEqual([record['depth'] for record in records], [2, 1])
+        for name in COUNTERS:
+            self.assertIn(name, records[-1])
+        self.assertEqual(records[-1]['nodes'], self.ai.stats.nodes)
+
+
+if __name__ == '__main__':
+    unittest.main()
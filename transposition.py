@@ -0,0 +1,41 @@
+# transposition.py
+
+# Bound types of a stored score
+EXACT = 0
+LOWER_BOUND = 1  # The score is at least this value (the search failed high)
+UPPER_BOUND = 2  # The score is at most this value (the search failed low)
+
+# Approximate memory taken by one filled slot: the list pointer plus an entry tuple and its ints
+ENTRY_BYTES = 160
+
+
+class TranspositionTable:
+    def __init__(self, size_mb=16):
+        self.size = max(1, int(size_mb * 1024 * 1024) // ENTRY_BYTES)
+        self.entries = [None] * self.size
+        self.generation = 0
+
+    def new_search(self):
+        # Entries from earlier searches stay usable but may be replaced regardless of depth
+        self.generation += 1
+
+    def clear(self):
+        self.entries = [None] * self.size
+        self.generation = 0
+
+    def probe(self, key):
+        # Returns (key, depth, score, bound, best_move, generation) or None
+        entry = self.entries[key % self.size]
+        if entry is not None and entry[0] == key:
+            return entry
+        return None
+
+    def store(self, key, depth, score, bound, best_move):
+        index = key % self.size
+        entry = self.entries[index]
+        # Depth-preferred replacement: keep a deeper entry from the current search
+        if entry is not None and entry[0] != key and entry[5] == self.generation and entry[1] > depth:
+            return
+        if best_move is None and entry is not None and entry[0] == key:
+            best_move = entry[4]
+        self.entries[index] = (key, depth, score, bound, best_move, self.generation)
@@ -0,0 +1,273 @@
+# uci.py
+
+# Universal Chess Interface front end, so the engine can be driven by chess GUIs and
+# match runners: python uci.py
+#
+# Commands are read from stdin by a separate thread and searches run in the background
+# (see search_worker.py), so isready and stop are answered while a search is running.
+# The engine has no castling, en passant or under-promotion: promotions are always to
+# a queen, and a move list containing an illegal move is played up to that move.
+
+import queue
+import sys
+import threading
+import time
+
+from chess_engine import ChessEngine, START_FEN
+from chess_ai import MATE_SCORE, MAX_SEARCH_DEPTH
+from opening_book import MemoryBook
+from search_worker import SearchWorker
+from transposition import TranspositionTable
+
+ENGINE_NAME = "Chess Bot"
+ENGINE_AUTHOR = "Chess Bot authors"
+DEFAULT_HASH_MB = 16
+MAX_HASH_MB = 1024
+MAX_THREADS = 64
+# Check options switching the search techniques of ChessAI.features
+FEATURE_OPTIONS = {
+    'PVS': 'pvs',
+    'NullMove': 'null_move',
+    'LMR': 'lmr',
+    'Aspiration': 'aspiration',
+}
+
+
+def uci_move(engine, move):
+    # Move string in UCI notation, with the queen suffix for promotions
+    (start_row, start_col), (end_row, _) = move
+    text = engine.move_to_str(move)
+    if engine.board[start_row][start_col].upper() == 'P' and end_row in (0, 7):
+        text += 'q'
+    return text
+
+
+def score_text(ai):
+    # UCI score of the last completed iteration, from the side to move's point of view
+    score = ai.best_score if ai.engine.current_player == 'black' else -ai.best_score
+    if abs(score) >= MATE_SCORE:
+        plies = ai.completed_depth - (abs(score) - MATE_SCORE)
+        moves = (plies + 1) // 2
+        return f"mate {moves if score > 0 else -moves}"
+    return f"cp {score}"
+
+
+def read_commands(stream, commands):
+    for line in stream:
+        commands.put(line)
+    commands.put('quit')  # End of input
+
+
+class UciSession:
+    def __init__(self, output=sys.stdout):
+        self.output = output
+        self.output_lock = threading.Lock()  # The search thread reports while commands are answered
+        self.engine = ChessEngine()
+        self.engine.ai.on_iteration = self.send_info
+        self.worker = None  # Running SearchWorker
+        self.reporter = None  # Thread that sends bestmove when the worker is done
+        self.search_args = {}  # Budget of the running go command, used again on ponderhit
+        self.released = threading.Event()  # Set once an infinite or ponder search may report bestmove
+
+    def send(self, line):
+        with self.output_lock:
+            self.output.write(line + '\n')
+            self.output.flush()
+
+    def handle(self, line):
+        # Runs one command; returns False on quit
+        tokens = line.split()
+        if not tokens:
+            return True
+        command, arguments = tokens[0], tokens[1:]
+        if command == 'uci':
+            self.send(f"id name {ENGINE_NAME}")
+            self.send(f"id author {ENGINE_AUTHOR}")
+            self.send(f"option name Hash type spin default {DEFAULT_HASH_MB} min 1 max {MAX_HASH_MB}")
+            self.send(f"option name Threads type spin default 1 min 1 max {MAX_THREADS}")
+            self.send("option name OwnBook type check default true")
+            for option, feature in FEATURE_OPTIONS.items():
+                default = 'true' if self.engine.ai.features[feature] else 'false'
+                self.send(f"option name {option} type check default {default}")
+            self.send("uciok")
+        elif command == 'isready':
+            self.send("readyok")
+        elif command == 'setoption':
+            self.set_option(arguments)
+        elif command == 'ucinewgame':
+            self.stop()
+            self.engine.ai.transposition_table.clear()
+            self.engine.ai.move_orderer.clear()
+        elif command == 'position':
+            self.stop()
+            self.set_position(arguments)
+        elif command == 'go':
+            self.stop()
+            self.go(arguments)
+        elif command == 'ponderhit':
+            self.ponderhit()
+        elif command == 'stop':
+            self.stop()
+        elif command == 'quit':
+            self.stop()
+            self.engine.ai.close()
+            return False
+        return True
+
+    def set_option(self, arguments):
+        # setoption name <name> value <value>
+        text = ' '.join(arguments)
+        if not text.startswith('name '):
+            return
+        name, _, value = text[5:].partition(' value ')
+        name = name.strip().lower()
+        ai = self.engine.ai
+        self.stop()  # The running search may use the pool or table being replaced
+        try:
+            if name == 'hash':
+                size_mb = min(max(int(value), 1), MAX_HASH_MB)
+                ai.tt_size_mb = size_mb
+                ai.transposition_table = TranspositionTable(size_mb)
+            elif name == 'threads':
+                ai.close()  # The pool is recreated with the new size on the next search
+                ai.workers = min(max(int(value), 1), MAX_THREADS)
+            elif name == 'ownbook':
+                ai.close_opening_book()
+                if value.strip().lower() != 'true':
+                    ai.opening_book = MemoryBook()
+            else:
+                for option, feature in FEATURE_OPTIONS.items():
+                    if name == option.lower():
+                        ai.close()  # Worker processes take the features when they start
+                        ai.features[feature] = value.strip().lower() == 'true'
+        except ValueError:
+            self.send(f"info string Invalid value for {name}: {value}")
+
+    def set_position(self, arguments):
+        # position [startpos | fen <fields>] [moves <move> ...]
+        if 'moves' in arguments:
+            split = arguments.index('moves')
+            setup, moves = arguments[:split], arguments[split + 1:]
+        else:
+            setup, moves = arguments, []
+        engine = self.engine
+        try:
+            if setup and setup[0] == 'fen':
+                engine.load_fen(' '.join(setup[1:]))
+            else:
+                engine.load_fen(START_FEN)
+        except ValueError as error:
+            self.send(f"info string {error}")
+            engine.load_fen(START_FEN)
+            return
+        for text in moves:
+            try:
+                move = engine.parse_move_str(text)
+            except (ValueError, IndexError):
+                move = None
+            if move is None or move not in engine.generate_all_moves():
+                self.send(f"info string Illegal move {text}")
+                break
+            engine.make_move(move)
+
+    def go(self, arguments):
+        options = {}
+        index = 0
+        while index < len(arguments):
+            name = arguments[index]
+            if name in ('infinite', 'ponder'):
+                options[name] = True
+                index += 1
+            elif index + 1 < len(arguments):
+                options[name] = arguments[index + 1]
+                index += 2
+            else:
+                index += 1
+
+        # Clock values are in milliseconds; ChessAI budgets are in seconds
+        try:
+            white = self.engine.current_player == 'white'
+            search_args = {}
+            if 'movetime' in options:
+                search_args['movetime'] = int(options['movetime']) / 1000
+            clock = options.get('wtime' if white else 'btime')
+            if clock is not None:
+                search_args['clock'] = max(int(clock), 0) / 1000
+                search_args['increment'] = int(options.get('winc' if white else 'binc', 0)) / 1000
+            if 'depth' in options:
+                search_args['depth'] = max(int(options['depth']), 1)
+            if 'nodes' in options:
+                search_args['nodes'] = int(options['nodes'])
+        except ValueError:
+            self.send("info string Invalid go command")
+            return
+
+        self.search_args = search_args
+        self.released.clear()
+        held = options.get('infinite') or options.get('ponder') or not search_args
+        if held:
+            # Search with no budget until stop, or until ponderhit sets the budget. A go
+            # without limits searches like go infinite.
+            self.worker = SearchWorker(self.engine, depth=MAX_SEARCH_DEPTH).start()
+        else:
+            self.released.set()
+            self.worker = SearchWorker(self.engine, **search_args).start()
+        self.reporter = threading.Thread(target=self.report_best_move, args=(self.worker,), daemon=True)
+        self.reporter.start()
+
+    def ponderhit(self):
+        # The opponent played the expected move: the ponder search continues as a normal search
+        if self.worker is not None and not self.released.is_set():
+            if self.search_args:
+                self.worker.ponderhit(**self.search_args)
+            else:
+                self.worker.move_now()  # go ponder without a budget: answer at once
+            self.released.set()
+
+    def stop(self):
+        # Ends the running search, if any, and waits until its bestmove is sent
+        if self.worker is None:
+            return
+        self.worker.move_now()
+        self.released.set()
+        self.reporter.join()
+        self.worker = None
+        self.reporter = None
+
+    def report_best_move(self, worker):
+        worker.thread.join()
+        self.released.wait()
+        engine = worker.engine
+        move = worker.move
+        if move is None:
+            self.send("bestmove 0000")
+            return
+        line = f"bestmove {uci_move(engine, move)}"
+        # The reply the search expects, for the GUI to ponder on
+        engine.apply_move(move)
+        expected = engine.ai.hash_move()
+        if expected is not None and expected in engine.generate_all_moves():
+            line += f" ponder {uci_move(engine, expected)}"
+        engine.undo_move()
+        self.send(line)
+
+    def send_info(self, ai):
+        stats = ai.stats
+        iteration = stats.iterations[-1]
+        elapsed = max(time.time() - stats.start_time, 0.001)
+        move = ai.engine.parse_move_str(iteration['best_move'])
+        self.send(f"info depth {iteration['depth']} score {score_text(ai)} nodes {stats.nodes} "
+                  f"nps {int(stats.nodes / elapsed)} time {int(elapsed * 1000)} pv {uci_move(ai.engine, move)}")
+
+
+def main():
+    commands = queue.Queue()
+    threading.Thread(target=read_commands, args=(sys.stdin, commands), daemon=True).start()
+    session = UciSession()
+    while session.handle(commands.get()):
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,33 @@
+# zobrist.py
+
+import random
+
+# Keys come from a fixed seed so position hashes are stable between runs
+# (opening books and other on-disk data can be keyed by them)
+_random = random.Random(0x5EED)
+
+PIECE_KEYS = {piece: [_random.getrandbits(64) for _ in range(64)] for piece in 'PNBRQKpnbrqk'}
+BLACK_TO_MOVE_KEY = _random.getrandbits(64)
+
+
+def compute_hash(board, current_player):
+    key = 0
+    for row in range(8):
+        for col in range(8):
+            piece = board[row][col]
+            if piece != ' ':
+                key ^= PIECE_KEYS[piece][row * 8 + col]
+    if current_player == 'black':
+        key ^= BLACK_TO_MOVE_KEY
+    return key
+
+
+def compute_pawn_hash(board):
+    # Key of the pawns alone, used to cache pawn structure scores
+    key = 0
+    for row in range(8):
+        for col in range(8):
+            piece = board[row][col]
+            if piece == 'P' or piece == 'p':
+                key ^= PIECE_KEYS[piece][row * 8 + col]
+    return key